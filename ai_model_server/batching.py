@@ -0,0 +1,164 @@
+"""
+Dynamic micro-batching for model inference.
+
+Requests submit one decoded image each. A scheduler task groups queued
+images into a batch of up to `max_batch_size`, waiting at most `max_wait_ms`
+after the first one arrives. It runs the whole batch through a single predict
+call and hands each row of the result back to the request that submitted it.
+
+With `max_concurrent_batches` > 1 (e.g. one per worker process of an
+InferenceWorkerPool), the next batch is collected and dispatched while earlier
+ones are still running.
+"""
+import asyncio
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+
+class BatcherOverloaded(Exception):
+    """Raised when the inference queue is full and the request should be shed."""
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        predict_fn: Union[Callable[[np.ndarray], np.ndarray], Callable[[np.ndarray], Awaitable[np.ndarray]]],
+        prepare_batch: Callable[[List[np.ndarray]], np.ndarray] = np.stack,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        max_queue_size: int = 256,
+        max_concurrent_batches: int = 1,
+        latency_window: int = 2000,
+    ):
+        # Either a blocking function (run on a dedicated inference thread) or a
+        # coroutine function that does its own dispatch (e.g. to worker processes).
+        self.predict_fn = predict_fn
+        self._predict_is_async = asyncio.iscoroutinefunction(predict_fn)
+        # Turns the queued images into one model input (e.g. fills a preallocated buffer).
+        # A reused buffer is only safe with max_concurrent_batches=1, where a batch
+        # is never prepared while the previous one is still in use.
+        self.prepare_batch = prepare_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.max_concurrent_batches = max_concurrent_batches
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+        # Batch preparation and inference run off the event loop so the next batch can fill up meanwhile
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes: Counter = Counter()
+        self._latencies = deque(maxlen=latency_window)
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._task = asyncio.create_task(self._run(), name="micro-batcher")
+
+    async def stop(self):
+        if self._task is not None:
+            for task in [self._task, *self._batch_tasks]:
+                task.cancel()
+            await asyncio.gather(self._task, *self._batch_tasks, return_exceptions=True)
+            self._task = None
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, image: np.ndarray) -> np.ndarray:
+        """Queues one decoded image (H x W x C) and waits for its prediction row."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((image, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise BatcherOverloaded(f"Inference queue is full ({self.max_queue_size} pending).")
+        return await future
+
+    async def submit_many(self, images: List[np.ndarray]) -> List[np.ndarray]:
+        """Queues several images together; they land in the same batch when there is room."""
+        return list(await asyncio.gather(*(self.submit(image) for image in images)))
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            # Wait for a free slot first, so requests keep filling the next batch
+            # while every slot is busy
+            await self._slots.acquire()
+            batch = await self._collect()
+            # Drop requests that gave up (e.g. client disconnected) before spending compute on them
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._process(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _process(self, batch: List[Tuple[np.ndarray, asyncio.Future, float]]):
+        images = [image for image, _, _ in batch]
+        loop = asyncio.get_running_loop()
+        try:
+            # Filling the batch is a copy of every image, so it stays off the event loop too
+            if self._predict_is_async:
+                inputs = await loop.run_in_executor(self._executor, self.prepare_batch, images)
+                predictions = await self.predict_fn(inputs)
+            else:
+                predictions = await loop.run_in_executor(
+                    self._executor, lambda: self.predict_fn(self.prepare_batch(images))
+                )
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        finished = time.perf_counter()
+        self.batches += 1
+        self.items += len(batch)
+        self.batch_sizes[len(batch)] += 1
+        for row, (_, future, enqueued) in zip(predictions, batch):
+            self._latencies.append(finished - enqueued)
+            if not future.done():
+                future.set_result(row)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "batches_in_flight": len(self._batch_tasks),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "latency_ms": {"p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99)},
+        }
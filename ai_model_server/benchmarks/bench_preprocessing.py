@@ -0,0 +1,118 @@
+"""
+Benchmark: per-image preprocessing time and peak memory, original path vs. the
+draft-mode pipeline in preprocessing.py, on a synthetic 12 MP phone photo.
+
+Each path runs in a fresh interpreter that reads the photo from disk itself,
+so neither inherits the other's (or the synthetic photo generator's) memory.
+Memory is VmHWM, the peak resident set, from /proc/self/status (Linux only),
+minus the resident set just before the path first runs.
+
+Usage (from the ai_model_server directory):
+    python benchmarks/bench_preprocessing.py [path/to/photo.jpg]
+"""
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessing import BatchBuffer, decode_to_input_size  # noqa: E402
+
+REPEAT = 20
+
+
+def synthetic_photo() -> bytes:
+    """A 4032x3024 JPEG with smooth gradients plus noise, compressed like a phone camera would."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:3024, 0:4032]
+    base = np.stack([x * 255 // 4032, y * 255 // 3024, (x + y) * 255 // 7056], axis=-1)
+    noisy = np.clip(base + rng.integers(-20, 20, base.shape), 0, 255).astype(np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(noisy).save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def original_path(data: bytes) -> np.ndarray:
+    # What the server did before: full decode, convert, resize, float copy, normalise.
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    image = image.resize((224, 224))
+    image_array = np.expand_dims(np.array(image), axis=0)
+    return image_array.astype(np.float32) / 127.5 - 1.0
+
+
+def new_path(data: bytes, buffer=BatchBuffer(1)) -> np.ndarray:
+    return buffer.fill([decode_to_input_size(data)])
+
+
+def memory_status_mb() -> dict:
+    """Current (VmRSS) and peak (VmHWM) resident set of this process, in MB."""
+    status = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                status[key] = int(value.split()[0]) / 1024  # reported in kB
+    return status
+
+
+def measure(name: str, photo_path: str):
+    """Runs one path in this (fresh) process and prints its timing and memory as JSON."""
+    with open(photo_path, "rb") as f:
+        data = f.read()
+    fn = original_path if name == "original" else new_path
+    baseline = memory_status_mb()["VmRSS"]
+    fn(data)  # warm up
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(data)
+    elapsed = (time.perf_counter() - start) / REPEAT
+    peak = memory_status_mb()["VmHWM"]
+    print(json.dumps({"elapsed": elapsed, "peak": peak, "added": peak - baseline}))
+
+
+def run_path(name: str, photo_path: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--measure", name, photo_path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--measure":
+        measure(sys.argv[2], sys.argv[3])
+        return
+
+    if len(sys.argv) > 1:
+        photo_path = sys.argv[1]
+        with open(photo_path, "rb") as f:
+            data = f.read()
+    else:
+        data = synthetic_photo()
+        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+            f.write(data)
+        photo_path = f.name
+    with Image.open(io.BytesIO(data)) as image:
+        print(f"Input: {image.size[0]}x{image.size[1]} {image.format}, {len(data) / 1e6:.1f} MB")
+
+    # Both paths must produce nearly the same model input
+    difference = np.abs(original_path(data)[0] - new_path(data)[0]).mean()
+    print(f"Mean absolute difference of normalised pixels: {difference:.4f}")
+
+    try:
+        print(f"{'path':>10} {'ms/image':>10} {'peak RSS (MB)':>14} {'added (MB)':>11}")
+        for name in ("original", "draft"):
+            result = run_path(name, photo_path)
+            print(f"{name:>10} {result['elapsed'] * 1000:>10.1f} {result['peak']:>14.1f} {result['added']:>11.1f}")
+    finally:
+        if len(sys.argv) == 1:
+            os.remove(photo_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Throughput scaling of the multi-process inference worker pool.
+
+Starts the pool with 1, 2, 4, ... workers (up to --max-workers, default the
+available cores) and keeps every worker busy with full batches of synthetic
+images, reporting images/s, speedup over one worker and scaling efficiency.
+By default each worker gets one intra-op thread, so the table shows scaling
+across cores rather than within one model.
+
+Usage (from the ai_model_server directory):
+    python benchmarks/bench_worker_pool.py [--backend keras|tflite|onnx] [--int8] [--max-workers 8] [--threads 1] [--batches 50]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessing import INPUT_SIZE  # noqa: E402
+from worker_pool import InferenceWorkerPool, available_cores  # noqa: E402
+
+
+async def measure(workers: int, args) -> float:
+    pool = InferenceWorkerPool(
+        workers,
+        args.backend,
+        model_dir=args.model_dir,
+        quantized=args.int8,
+        intra_op_threads=args.threads,
+        max_batch_size=args.batch_size,
+    )
+    await pool.load()
+    if not pool.ready:
+        raise RuntimeError(pool.error)
+
+    rng = np.random.default_rng(0)
+    batch = rng.integers(0, 256, (args.batch_size, INPUT_SIZE[1], INPUT_SIZE[0], 3), dtype=np.uint8)
+    total = args.batches * workers
+
+    async def client(count: int):
+        for _ in range(count):
+            await pool.predict(batch)
+
+    try:
+        start = time.perf_counter()
+        # One client per worker keeps every worker busy, like a saturated batcher
+        await asyncio.gather(*(client(args.batches) for _ in range(workers)))
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.close()
+    return total * args.batch_size / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="tflite")
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--model-dir", default=os.getenv("MODEL_PATH", "./models/"))
+    parser.add_argument("--max-workers", type=int, default=available_cores())
+    parser.add_argument("--threads", type=int, default=1, help="Intra-op threads per worker")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--batches", type=int, default=50, help="Batches per worker")
+    args = parser.parse_args()
+
+    counts = []
+    workers = 1
+    while workers <= args.max_workers:
+        counts.append(workers)
+        workers *= 2
+    if counts[-1] != args.max_workers:
+        counts.append(args.max_workers)
+
+    print(f"{available_cores()} cores available, backend {args.backend}{' int8' if args.int8 else ''}, "
+          f"batch {args.batch_size}, {args.threads} thread(s) per worker")
+    print(f"{'workers':>8} {'images/s':>10} {'speedup':>8} {'efficiency':>11}")
+    baseline = None
+    for count in counts:
+        throughput = asyncio.run(measure(count, args))
+        baseline = baseline or throughput
+        speedup = throughput / baseline
+        print(f"{count:>8} {throughput:>10.1f} {speedup:>7.2f}x {speedup / count:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Accuracy-vs-latency harness for the inference backends.
+
+Runs the same photos through each backend, reports per-image latency, and
+checks top-1 ImageNet class and civic category agreement against the Keras
+reference. Any category mismatch is listed; --strict exits non-zero on one.
+
+Usage (from the ai_model_server directory, after export_model.py):
+    python benchmarks/compare_backends.py --images photos/ [--backends keras,tflite,tflite-int8,onnx] [--threads 4]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from category_mapping import CategoryMapper  # noqa: E402
+from inference_backends import create_backend  # noqa: E402
+from preprocessing import BatchBuffer, decode_to_input_size  # noqa: E402
+
+BATCH_SIZE = 16
+
+
+def run_backend(backend, images):
+    buffer = BatchBuffer(BATCH_SIZE)
+    backend.predict(buffer.fill(images[:1]))  # warm up
+    outputs = []
+    start = time.perf_counter()
+    for offset in range(0, len(images), BATCH_SIZE):
+        outputs.append(backend.predict(buffer.fill(images[offset:offset + BATCH_SIZE])).copy())
+    elapsed = time.perf_counter() - start
+    return np.concatenate(outputs), elapsed / len(images)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Directory of sample photos")
+    parser.add_argument("--backends", default="keras,tflite,tflite-int8,onnx")
+    parser.add_argument("--model-dir", default=os.getenv("MODEL_PATH", "./models/"))
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--strict", action="store_true", help="Fail if any category differs from Keras")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.images, "*")))
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append(decode_to_input_size(f.read()))
+    print(f"{len(images)} images, batch size {BATCH_SIZE}")
+
+    mapper = CategoryMapper(model_dir=args.model_dir)
+    reference = None
+    mismatches = 0
+    print(f"{'backend':>12} {'ms/image':>10} {'top-1 agree':>12} {'category agree':>15}")
+    for spec in ["keras"] + [b for b in args.backends.split(",") if b != "keras"]:
+        name, _, variant = spec.partition("-")
+        try:
+            backend = create_backend(
+                name, model_dir=args.model_dir, quantized=(variant == "int8"), intra_op_threads=args.threads
+            )
+        except Exception as e:
+            print(f"{spec:>12} skipped: {e}")
+            continue
+
+        probabilities, latency = run_backend(backend, images)
+        categories = [result["category"] for result in mapper.results(probabilities)]
+        if reference is None:
+            reference = (probabilities.argmax(axis=1), categories)
+
+        top1_agreement = (probabilities.argmax(axis=1) == reference[0]).mean()
+        category_agreement = np.mean([a == b for a, b in zip(categories, reference[1])])
+        print(f"{spec:>12} {latency * 1000:>10.2f} {top1_agreement:>11.1%} {category_agreement:>14.1%}")
+
+        for path, expected, actual in zip(paths, reference[1], categories):
+            if expected != actual:
+                mismatches += 1
+                print(f"{'':>12} {os.path.basename(path)}: keras={expected!r} {spec}={actual!r}")
+
+    if args.strict and mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Mapping from ImageNet predictions to civic issue categories.
+
+category_mapping.json lists, for each civic category, the ImageNet labels that
+count as evidence for it. At startup the labels are resolved to class indices
+and turned into a (1000, C) matrix, so a whole batch of probability vectors is
+scored with one matrix product: each category gets the total probability mass
+of its classes, not just a hit on the top-1 label. The best category wins if
+its mass reaches `min_score`; otherwise the image is the fallback category,
+with the mass of the unmapped classes as its confidence.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import urllib.request
+from typing import List
+
+import numpy as np
+
+CATEGORY_MAPPING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_mapping.json")
+CLASS_INDEX_FILENAME = "imagenet_class_index.json"
+CLASS_INDEX_URL = "https://storage.googleapis.com/download.tensorflow.org/data/imagenet_class_index.json"
+DOWNLOAD_TIMEOUT_SECONDS = 30
+
+
+def _download(url: str, path: str):
+    """Downloads to a temporary file next to `path` and renames it, so an interrupted download leaves nothing behind."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f, urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT_SECONDS) as response:
+            f.write(response.read())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def load_class_labels(model_dir: str) -> List[str]:
+    """
+    Returns the 1000 ImageNet labels (Keras naming, e.g. "manhole_cover") by
+    class index, from the model directory, downloading the index there once.
+    """
+    path = os.path.join(model_dir, CLASS_INDEX_FILENAME)
+    if not os.path.exists(path):
+        print(f"Downloading ImageNet class index to {path}")
+        _download(CLASS_INDEX_URL, path)
+    with open(path) as f:
+        class_index = json.load(f)
+    return [class_index[str(index)][1] for index in range(len(class_index))]
+
+
+class CategoryMapper:
+    def __init__(self, mapping_path: str = CATEGORY_MAPPING_PATH, model_dir: str = "./models/"):
+        with open(mapping_path, "rb") as f:
+            raw = f.read()
+        config = json.loads(raw)
+        # Changes whenever the mapping does, so cached category results can be keyed by it
+        self.version = f"v{config.get('version', 1)}-{hashlib.sha256(raw).hexdigest()[:8]}"
+        self.min_score = float(config.get("min_score", 0.2))
+        self.fallback_category = config.get("fallback_category", "General Inquiry")
+        self.categories = list(config["categories"])
+
+        labels = load_class_labels(model_dir)
+        index_of = {label: index for index, label in enumerate(labels)}
+        # A label listed under several categories splits its probability between them
+        owners = {}
+        for column, category in enumerate(self.categories):
+            for label in config["categories"][category]:
+                if label not in index_of:
+                    print(f"WARNING: Unknown ImageNet label '{label}' for category '{category}' in {mapping_path}; ignoring it.")
+                    continue
+                owners.setdefault(index_of[label], []).append(column)
+
+        self.matrix = np.zeros((len(labels), len(self.categories)), dtype=np.float32)
+        for index, columns in owners.items():
+            self.matrix[index, columns] = 1.0 / len(columns)
+
+    def scores(self, probabilities: np.ndarray) -> np.ndarray:
+        """(N, 1000) class probabilities -> (N, C) probability mass per category."""
+        return probabilities @ self.matrix
+
+    def results(self, probabilities: np.ndarray) -> List[dict]:
+        """Maps a batch of model output rows to our category and its confidence, one dict per row."""
+        scores = self.scores(probabilities)
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(scores)), best]
+        unmapped = 1.0 - scores.sum(axis=1)
+
+        results = []
+        for column, score, rest in zip(best, best_scores, unmapped):
+            if score >= self.min_score:
+                results.append({"category": self.categories[column], "confidence": float(score)})
+            else:
+                results.append({"category": self.fallback_category, "confidence": float(max(rest, 0.0))})
+        return results
@@ -0,0 +1,82 @@
+"""
+Exports the Keras MobileNetV2 to the runtime formats used by inference_backends.py.
+
+Writes into MODEL_PATH (default ./models/):
+- mobilenetv2.tflite       float32 TFLite model
+- mobilenetv2_int8.tflite  int8-quantized TFLite model (float input/output)
+- mobilenetv2.onnx         ONNX model with a dynamic batch dimension (needs tf2onnx)
+
+Calibration images for int8 quantization are read from --calibration-dir if
+given (a few hundred representative report photos work best), otherwise
+random inputs are used, which is fine for a smoke test but costs accuracy.
+
+Usage:
+    python export_model.py [--calibration-dir photos/] [--skip-onnx]
+"""
+import argparse
+import glob
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
+
+from inference_backends import ONNX_FILENAME, TFLITE_FILENAME, TFLITE_INT8_FILENAME
+from preprocessing import BatchBuffer, decode_to_input_size
+
+CALIBRATION_SAMPLES = 200
+
+
+def representative_dataset(calibration_dir):
+    paths = sorted(glob.glob(os.path.join(calibration_dir, "*"))) if calibration_dir else []
+    buffer = BatchBuffer(1)
+
+    def generator():
+        if paths:
+            for path in paths[:CALIBRATION_SAMPLES]:
+                with open(path, "rb") as f:
+                    yield [buffer.fill([decode_to_input_size(f.read())]).copy()]
+        else:
+            rng = np.random.default_rng(0)
+            for _ in range(CALIBRATION_SAMPLES):
+                yield [rng.uniform(-1.0, 1.0, (1, 224, 224, 3)).astype(np.float32)]
+
+    return generator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=os.getenv("MODEL_PATH", "./models/"))
+    parser.add_argument("--calibration-dir", help="Directory of sample photos for int8 calibration")
+    parser.add_argument("--skip-onnx", action="store_true")
+    args = parser.parse_args()
+
+    os.makedirs(args.model_dir, exist_ok=True)
+    model = MobileNetV2(weights='imagenet')
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    path = os.path.join(args.model_dir, TFLITE_FILENAME)
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+    print(f"Wrote {path}")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset(args.calibration_dir)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    path = os.path.join(args.model_dir, TFLITE_INT8_FILENAME)
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+    print(f"Wrote {path}")
+
+    if not args.skip_onnx:
+        import tf2onnx
+
+        path = os.path.join(args.model_dir, ONNX_FILENAME)
+        spec = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name="input"),)
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=path)
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
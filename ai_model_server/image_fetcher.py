@@ -0,0 +1,83 @@
+"""
+Async image fetching for the classification endpoints.
+
+One shared httpx client keeps a connection pool to the storage host(s). A
+per-host semaphore caps how many downloads hit the same host at once, and
+downloads are streamed and aborted as soon as they exceed a maximum size.
+"""
+import asyncio
+from collections import defaultdict
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+
+class ImageFetchError(Exception):
+    """Raised when an image can't be downloaded or is too large."""
+
+
+class ImageTooLarge(ImageFetchError):
+    """Raised when an image exceeds the size limit; unlike other fetch errors, retrying won't help."""
+
+
+class ImageUnavailable(ImageFetchError):
+    """Raised when storage refuses the image for good (e.g. 404, 403, 410); retrying won't help."""
+
+
+# 4xx answers that may well succeed on a later attempt
+RETRYABLE_STATUS_CODES = {408, 429}
+
+
+class ImageFetcher:
+    def __init__(
+        self,
+        max_connections: int = 64,
+        per_host_limit: int = 8,
+        max_bytes: int = 10 * 1024 * 1024,
+        timeout: float = 10.0,
+    ):
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self.per_host_limit))
+
+    async def start(self):
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch(self, url: str) -> bytes:
+        """Downloads `url` and returns its body, failing fast if it exceeds `max_bytes`."""
+        if self._client is None:
+            await self.start()
+
+        host = urlsplit(url).netloc
+        async with self._host_limits[host]:
+            try:
+                async with self._client.stream("GET", url) as response:
+                    status = response.status_code
+                    if 400 <= status < 500 and status not in RETRYABLE_STATUS_CODES:
+                        raise ImageUnavailable(f"Storage answered {status} for the image.")
+                    response.raise_for_status()
+                    declared = response.headers.get("content-length")
+                    if declared is not None and int(declared) > self.max_bytes:
+                        raise ImageTooLarge(f"Image is {declared} bytes, above the {self.max_bytes} byte limit.")
+
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body.extend(chunk)
+                        if len(body) > self.max_bytes:
+                            raise ImageTooLarge(f"Image exceeds the {self.max_bytes} byte limit.")
+                    return bytes(body)
+            except httpx.HTTPError as e:
+                raise ImageFetchError(f"Could not download image: {e}") from e
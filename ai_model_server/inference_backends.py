@@ -0,0 +1,139 @@
+"""
+Pluggable inference backends for the classifier.
+
+All backends take a float32 batch of shape (N, 224, 224, 3), already normalised
+for MobileNetV2, and return ImageNet probabilities of shape (N, 1000):
+
+- "keras":  the full Keras MobileNetV2 (reference implementation).
+- "tflite": an exported TFLite model, optionally int8-quantized.
+- "onnx":   an exported ONNX model run by ONNX Runtime.
+
+The runtime models are produced by export_model.py; the Keras weights are
+copied into the model directory on first use. Thread counts are
+configurable so a process can be sized to the cores it is given.
+"""
+import os
+from typing import Optional
+
+import numpy as np
+
+TFLITE_FILENAME = "mobilenetv2.tflite"
+TFLITE_INT8_FILENAME = "mobilenetv2_int8.tflite"
+ONNX_FILENAME = "mobilenetv2.onnx"
+KERAS_WEIGHTS_FILENAME = "mobilenetv2_imagenet.weights.h5"
+
+
+class InferenceBackend:
+    name = "base"
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class KerasBackend(InferenceBackend):
+    name = "keras"
+
+    def __init__(
+        self,
+        weights_path: Optional[str] = None,
+        intra_op_threads: Optional[int] = None,
+        inter_op_threads: Optional[int] = None,
+    ):
+        import tensorflow as tf
+        from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
+
+        # Must be set before TensorFlow creates its thread pools
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        if weights_path and os.path.exists(weights_path):
+            self.model = MobileNetV2(weights=None)
+            self.model.load_weights(weights_path)
+        else:
+            self.model = MobileNetV2(weights='imagenet')
+            if weights_path:
+                # Keep a copy next to the other model files so restarts never re-download
+                os.makedirs(os.path.dirname(weights_path) or ".", exist_ok=True)
+                self.model.save_weights(weights_path)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # Calling the model directly skips predict()'s per-call dataset/callback setup
+        return self.model(batch, training=False).numpy()
+
+
+class TFLiteBackend(InferenceBackend):
+    name = "tflite"
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self._input = self.interpreter.get_input_details()[0]
+        self._output_index = self.interpreter.get_output_details()[0]["index"]
+        self._batch_size = None
+
+    def _resize(self, batch_size: int):
+        if batch_size != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input["index"], [batch_size, *self._input["shape"][1:]])
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch_size = batch_size
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        self._resize(len(batch))
+        dtype = self._input["dtype"]
+        if dtype != np.float32:
+            # Fully-integer models take quantized input: q = x / scale + zero_point
+            scale, zero_point = self._input["quantization"]
+            batch = np.clip(np.round(batch / scale + zero_point), np.iinfo(dtype).min, np.iinfo(dtype).max).astype(dtype)
+        self.interpreter.set_tensor(self._input["index"], batch)
+        self.interpreter.invoke()
+        output = self.interpreter.get_tensor(self._output_index)
+        if output.dtype != np.float32:
+            scale, zero_point = self._output["quantization"]
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+class ONNXBackend(InferenceBackend):
+    name = "onnx"
+
+    def __init__(self, model_path: str, intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+def create_backend(
+    name: str,
+    model_dir: str = "./models/",
+    quantized: bool = False,
+    intra_op_threads: Optional[int] = None,
+    inter_op_threads: Optional[int] = None,
+) -> InferenceBackend:
+    """Builds the backend called `name`, loading exported runtime models from `model_dir`."""
+    name = name.lower()
+    if name == "keras":
+        return KerasBackend(os.path.join(model_dir, KERAS_WEIGHTS_FILENAME), intra_op_threads, inter_op_threads)
+    if name == "tflite":
+        filename = TFLITE_INT8_FILENAME if quantized else TFLITE_FILENAME
+        return TFLiteBackend(os.path.join(model_dir, filename), num_threads=intra_op_threads)
+    if name == "onnx":
+        return ONNXBackend(os.path.join(model_dir, ONNX_FILENAME), intra_op_threads, inter_op_threads)
+    raise ValueError(f"Unknown inference backend '{name}'. Use keras, tflite or onnx.")
@@ -1,76 +1,324 @@
-import io
-import requests
-from fastapi import FastAPI, HTTPException
+import os
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, HTTPException, Form, UploadFile, File
 from pydantic import BaseModel, Field
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 
 # --- TensorFlow and Image Processing Imports ---
 import numpy as np
-from PIL import Image
-from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2, preprocess_input, decode_predictions
+
+from batching import BatcherOverloaded, MicroBatcher
+from category_mapping import CATEGORY_MAPPING_PATH, CategoryMapper
+from image_fetcher import ImageFetcher, ImageTooLarge, ImageUnavailable
+from inference_backends import create_backend
+from model_loader import ModelLoader
+from prediction_cache import PredictionCache, content_hash
+from preprocessing import BatchBuffer, ImageDecodeError, decode_to_input_size
+from text_classifier import GENERAL_CATEGORY, text_classifier
+from worker_pool import InferenceWorkerPool
 
 # --- 1. Load Model ---
-model = MobileNetV2(weights='imagenet')
+# INFERENCE_BACKEND picks the runtime: "keras" (default), "tflite" or "onnx".
+# The latter two load models exported by export_model.py from MODEL_PATH.
+# The model is built and warmed up in the background after startup (see lifespan),
+# so the process answers /health/live right away and /health/ready once it is warm.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "keras")
+INFERENCE_QUANTIZED = os.getenv("INFERENCE_QUANTIZED", "false").lower() == "true"
+MODEL_PATH = os.getenv("MODEL_PATH", "./models/")
+INFERENCE_INTRA_OP_THREADS = int(os.getenv("INFERENCE_INTRA_OP_THREADS", "0")) or None
+INFERENCE_INTER_OP_THREADS = int(os.getenv("INFERENCE_INTER_OP_THREADS", "0")) or None
+# INFERENCE_WORKERS > 0 runs that many inference processes, each with its own model
+# and (unless the thread counts above are set) an even share of the cores.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+
+def build_backend():
+    return create_backend(
+        INFERENCE_BACKEND,
+        model_dir=MODEL_PATH,
+        quantized=INFERENCE_QUANTIZED,
+        intra_op_threads=INFERENCE_INTRA_OP_THREADS,
+        inter_op_threads=INFERENCE_INTER_OP_THREADS,
+    )
+
+# Requests are coalesced into batches of up to MAX_BATCH_SIZE images, waiting at
+# most MAX_BATCH_WAIT_MS for a batch to fill, with at most MAX_QUEUE_SIZE waiting.
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "16"))
+batch_options = dict(
+    max_batch_size=MAX_BATCH_SIZE,
+    max_wait_ms=float(os.getenv("MAX_BATCH_WAIT_MS", "10")),
+    max_queue_size=int(os.getenv("MAX_QUEUE_SIZE", "256")),
+)
+if INFERENCE_WORKERS > 0:
+    model = InferenceWorkerPool(
+        INFERENCE_WORKERS,
+        INFERENCE_BACKEND,
+        model_dir=MODEL_PATH,
+        quantized=INFERENCE_QUANTIZED,
+        intra_op_threads=INFERENCE_INTRA_OP_THREADS,
+        inter_op_threads=INFERENCE_INTER_OP_THREADS,
+        max_batch_size=MAX_BATCH_SIZE,
+    )
+    # One batch in flight per worker; workers normalise the stacked uint8 images themselves
+    batcher = MicroBatcher(model.predict, prepare_batch=np.stack, max_concurrent_batches=INFERENCE_WORKERS, **batch_options)
+else:
+    model = ModelLoader(build_backend, warmup_batch_sizes=(1, MAX_BATCH_SIZE))
+    batcher = MicroBatcher(model.predict, prepare_batch=BatchBuffer(MAX_BATCH_SIZE).fill, **batch_options)
+
+# ImageNet class -> civic category matrix, from CATEGORY_MAPPING_PATH (a JSON data file).
+# Built by the background load task, since it may first download the ImageNet class index.
+CATEGORY_MAPPING_FILE = os.getenv("CATEGORY_MAPPING_PATH", CATEGORY_MAPPING_PATH)
+category_mapper: Optional[CategoryMapper] = None
+
+# Shared connection pool for downloading images from storage
+image_fetcher = ImageFetcher(
+    max_connections=int(os.getenv("FETCH_MAX_CONNECTIONS", "64")),
+    per_host_limit=int(os.getenv("FETCH_PER_HOST_LIMIT", "8")),
+    max_bytes=int(os.getenv("FETCH_MAX_BYTES", str(10 * 1024 * 1024))),
+    timeout=float(os.getenv("FETCH_TIMEOUT", "10")),
+)
+
+# Predictions keyed by image content hash (and URL), so repeat photos skip the model.
+# Set PREDICTION_CACHE_PATH to also keep them on disk across restarts. The namespace
+# covers the model and the category mapping, so changing either starts afresh. The
+# mapping's version is added by the load task once it has built the mapper; the cache
+# is only used for image predictions, which wait for that.
+MODEL_NAMESPACE = f"{os.getenv('MODEL_NAME', 'mobilenetv2')}:{INFERENCE_BACKEND}{':int8' if INFERENCE_QUANTIZED else ''}"
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    disk_path=os.getenv("PREDICTION_CACHE_PATH") or None,
+    max_disk_entries=int(os.getenv("PREDICTION_CACHE_DISK_SIZE", "500000")),
+    namespace=MODEL_NAMESPACE,
+)
 
 # --- 2. Business Logic ---
-def map_prediction_to_category(raw_prediction_label: str) -> str:
-    label = raw_prediction_label.lower()
-    if any(keyword in label for keyword in ['truck', 'car', 'bus', 'ambulance', 'motorcycle', 'convertible', 'wreck']):
-        return "Traffic Obstruction"
-    if any(keyword in label for keyword in ['trash_can', 'garbage', 'waste', 'bin', 'dumpster']):
-        return "Waste Management"
-    if any(keyword in label for keyword in ['street_lamp', 'spotlight', 'street_sign']):
-        return "Streetlight Outage"
-    if any(keyword in label for keyword in ['pothole', 'manhole_cover']):
-        return "Pothole"
-    return "General Inquiry"
+def fuse_image_results(results: List[dict]) -> dict:
+    """
+    Fuses per-image classifications into one decision. Each category scores the
+    sum of the confidences of the images assigned to it, divided by the number
+    of images. Images showing nothing civic ("General Inquiry") only win when
+    no image matched a real category.
+    """
+    scores = defaultdict(float)
+    for result in results:
+        scores[result["category"]] += result["confidence"] / len(results)
+
+    civic_scores = {category: score for category, score in scores.items() if category != "General Inquiry"}
+    best_category = max(civic_scores or scores, key=(civic_scores or scores).get)
+    return {"category": best_category, "confidence": float(scores[best_category])}
 
 # --- 3. Schemas ---
 class AIRequest(BaseModel):
     description: str
     # UPDATED: The list can now be empty, removing the strict validation.
     image_urls: List[str] = []
+    # Set to get each image's own classification back alongside the fused one
+    include_breakdown: bool = False
+
+class ImageClassification(BaseModel):
+    image_url: Optional[str] = None
+    filename: Optional[str] = None # Set instead of image_url for uploaded images
+    category: Optional[str] = None
+    confidence: Optional[float] = None
+    error: Optional[str] = None
 
 class AIResponse(BaseModel):
     category: str
     confidence: float
+    images: Optional[List[ImageClassification]] = None
 
 # --- 4. Image Processing ---
-def classify_image_from_url(url: str):
+# Per-image failures that would happen again on a retry (the rest, such as a
+# storage timeout, are worth retrying)
+PERMANENT_IMAGE_ERRORS = (ImageDecodeError, ImageTooLarge, ImageUnavailable)
+
+async def prepare_image(data: bytes, url: Optional[str] = None):
+    """
+    Returns the cached result for these image bytes, or a (content hash,
+    decoded image) pair that still needs a prediction.
+    """
+    digest = content_hash(data)
+    cached = await prediction_cache.get(digest, url)
+    if cached is not None:
+        return cached
+    # Decoding is CPU-bound, so it runs off the event loop
+    return digest, await run_in_threadpool(decode_to_input_size, data)
+
+async def predict_prepared(prepared: list, source_key: str, sources: List[str]) -> List[dict]:
+    """
+    Runs every image still needing a prediction through the batcher together,
+    so a request's images share one forward pass, and caches the new results.
+    Returns one result per source, in order, with an "error" key for failed images.
+    """
+    to_predict = [item for item in prepared if isinstance(item, tuple)]
+    predictions = await batcher.submit_many([image for _, image in to_predict]) if to_predict else []
+    # Maps every new prediction of the request with one matrix product
+    new_results = iter(category_mapper.results(np.stack(predictions))) if predictions else iter(())
+
+    results = []
+    for source, item in zip(sources, prepared):
+        if isinstance(item, Exception):
+            results.append({source_key: source, "error": str(item), "permanent": isinstance(item, PERMANENT_IMAGE_ERRORS)})
+        elif isinstance(item, tuple):
+            result = next(new_results)
+            prediction_cache.put(item[0], result, source if source_key == "image_url" else None)
+            results.append({source_key: source, **result})
+        else:
+            results.append({source_key: source, **item})
+    return results
+
+async def classify_images_from_urls(urls: List[str]) -> List[dict]:
+    """Classifies every image of a request, downloading them concurrently."""
+    async def load(url: str):
+        cached = await prediction_cache.get_by_url(url)
+        if cached is not None:
+            return cached
+        try:
+            # Downloads overlap with other requests' inference
+            return await prepare_image(await image_fetcher.fetch(url), url)
+        except Exception as e:
+            print(f"ERROR: Could not process image from URL {url}. Reason: {e}")
+            return e
+
+    prepared = await asyncio.gather(*(load(url) for url in urls))
+    return await predict_prepared(prepared, "image_url", urls)
+
+async def classify_uploaded_images(images: List[UploadFile]) -> List[dict]:
+    """Classifies images sent directly in the request body."""
+    async def load(image: UploadFile):
+        try:
+            # One byte past the limit is enough to reject the image without buffering all of it
+            data = await image.read(image_fetcher.max_bytes + 1)
+            if len(data) > image_fetcher.max_bytes:
+                raise ImageTooLarge(f"Image exceeds the {image_fetcher.max_bytes} byte limit.")
+            return await prepare_image(data)
+        except Exception as e:
+            print(f"ERROR: Could not process uploaded image {image.filename}. Reason: {e}")
+            return e
+
+    prepared = await asyncio.gather(*(load(image) for image in images))
+    return await predict_prepared(prepared, "filename", [image.filename for image in images])
+
+def inference_failed(e: Exception) -> HTTPException:
+    """An inference error (e.g. a worker died) is an outage, not a problem with the request."""
+    print(f"ERROR: Inference failed: {e}")
+    return HTTPException(status_code=503, detail=f"Inference failed: {e}")
+
+def require_model():
+    if not model.ready:
+        raise HTTPException(status_code=503, detail=f"Model is not ready ({model.status}).")
+
+def text_response(description: str) -> dict:
+    category, confidence = text_classifier.classify(description)
+    return {"category": category, "confidence": confidence}
+
+def fused_response(results: List[dict], include_breakdown: bool, description: str = "") -> dict:
+    classified = [r for r in results if "error" not in r]
+    if not classified:
+        # 422 tells the caller not to retry; 502 that the images may load next time
+        if all(r["permanent"] for r in results):
+            raise HTTPException(status_code=422, detail="None of the images could be loaded or decoded.")
+        raise HTTPException(status_code=502, detail="Failed to download the images.")
+    
+    fused = fuse_image_results(classified)
+    if fused["category"] == GENERAL_CATEGORY:
+        # The photos show nothing we map to a category; the description may still say what it is
+        from_text = text_response(description)
+        if from_text["category"] != GENERAL_CATEGORY:
+            fused = from_text
+    if include_breakdown:
+        fused["images"] = results
+    return fused
+
+# --- 5. FastAPI App ---
+async def load_model():
+    """Builds the category mapper, then loads the model. A mapper failure fails the model too."""
+    global category_mapper
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        image = Image.open(io.BytesIO(response.content)).convert("RGB")
-        image = image.resize((224, 224))
-        image_array = np.array(image)
-        image_array = np.expand_dims(image_array, axis=0)
-        processed_image = preprocess_input(image_array)
-        
-        predictions = model.predict(processed_image)
-        decoded_predictions = decode_predictions(predictions, top=1)[0]
-        
-        top_prediction = decoded_predictions[0]
-        _, raw_label, confidence = top_prediction
-        final_category = map_prediction_to_category(raw_label)
-        
-        return {"category": final_category, "confidence": float(confidence)}
+        category_mapper = await asyncio.to_thread(CategoryMapper, CATEGORY_MAPPING_FILE, model_dir=MODEL_PATH)
     except Exception as e:
-        print(f"ERROR: Could not process image from URL {url}. Reason: {e}")
-        return None
+        print(f"ERROR: Could not build the category mapping: {e}")
+        model.status = "failed"
+        model.error = f"Category mapping: {e}"
+        return
+    prediction_cache.namespace = f"{MODEL_NAMESPACE}:{category_mapper.version}"
+    await model.load()
 
-# --- 5. FastAPI App ---
-app = FastAPI(title="Real AI Classification Server")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await image_fetcher.start()
+    batcher.start()
+    load_task = asyncio.create_task(load_model(), name="model-load")
+    yield
+    load_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await load_task
+    await batcher.stop()
+    if INFERENCE_WORKERS > 0:
+        # Joins each worker process, so it runs off the event loop
+        await run_in_threadpool(model.close)
+    await image_fetcher.close()
+    # Waits for the writer thread to save what is still queued
+    await run_in_threadpool(prediction_cache.close)
+
+app = FastAPI(title="Real AI Classification Server", lifespan=lifespan)
 
 @app.post("/api/classify", response_model=AIResponse)
 async def classify_issue(request: AIRequest):
-    # If no images are provided, we can't classify.
-    # A more advanced model could use the description, but ours can't.
+    # Without images, classify from the description alone
     if not request.image_urls:
-        return AIResponse(category="General Inquiry", confidence=0.0)
-
-    image_url = request.image_urls[0]
-    result = classify_image_from_url(image_url)
-    if result is None:
-        raise HTTPException(status_code=500, detail="Failed to process the image.")
-        
-    return result
\ No newline at end of file
+        return text_response(request.description)
+
+    require_model()
+    try:
+        results = await classify_images_from_urls(request.image_urls)
+    except BatcherOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise inference_failed(e)
+    
+    return fused_response(results, request.include_breakdown, request.description)
+
+@app.post("/api/classify/upload", response_model=AIResponse)
+async def classify_issue_upload(
+    description: str = Form(""),
+    images: List[UploadFile] = File([]),
+    include_breakdown: bool = Form(False)
+):
+    """
+    Same as /api/classify, but takes the image bytes directly as multipart files
+    instead of URLs, saving the round trip through storage.
+    """
+    if not images:
+        return text_response(description)
+
+    require_model()
+    try:
+        results = await classify_uploaded_images(images)
+    except BatcherOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise inference_failed(e)
+    
+    return fused_response(results, include_breakdown, description)
+
+@app.get("/health/live")
+def liveness():
+    """The process is up. Fails only if the model could not be loaded, so the instance gets restarted."""
+    if model.status == "failed":
+        raise HTTPException(status_code=503, detail=model.health())
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness():
+    """The model is loaded and warmed up; route traffic here only once this returns 200."""
+    if not model.ready:
+        raise HTTPException(status_code=503, detail=model.health())
+    return model.health()
+
+@app.get("/api/metrics")
+def get_metrics():
+    """Inference scheduler batch sizes, queue depth and latency percentiles, plus cache hit rates."""
+    return {"model": model.health(), "batching": batcher.stats(), "prediction_cache": prediction_cache.stats()}
@@ -0,0 +1,89 @@
+"""
+Model lifecycle: loading, warmup and readiness.
+
+The server starts answering liveness probes immediately; the inference backend
+is built in a background thread once the app is up, then warmed up by running
+dummy batches through it so the first real request doesn't pay for graph
+tracing, tensor allocation or lazy kernel initialisation. Only after that does
+the server report itself ready, so a load balancer only routes traffic to a
+warm model.
+"""
+import asyncio
+import time
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+from inference_backends import InferenceBackend
+from preprocessing import INPUT_SIZE, BatchBuffer
+
+# perf_counter() at import time, as close to process start as the app gets
+PROCESS_STARTED = time.perf_counter()
+
+
+def warm_up(backend: InferenceBackend, batch_sizes: Iterable[int]):
+    """
+    Runs one blank batch of each size through the backend. Covers every batch
+    size the batcher will commonly use: runtimes like TFLite reallocate tensors
+    whenever the input shape changes.
+    """
+    batch_sizes = sorted(set(batch_sizes))
+    buffer = BatchBuffer(batch_sizes[-1])
+    blank = np.zeros((INPUT_SIZE[1], INPUT_SIZE[0], 3), dtype=np.uint8)
+    for batch_size in batch_sizes:
+        backend.predict(buffer.fill([blank] * batch_size))
+
+
+class ModelNotReady(Exception):
+    """Raised when a prediction is requested before the model has loaded and warmed up."""
+
+
+class ModelLoader:
+    def __init__(self, build_backend: Callable[[], InferenceBackend], warmup_batch_sizes: Iterable[int] = (1,)):
+        self.build_backend = build_backend
+        self.warmup_batch_sizes = sorted(set(warmup_batch_sizes))
+        self.backend: Optional[InferenceBackend] = None
+        self.status = "starting"  # starting -> loading -> warming_up -> ready, or failed
+        self.error: Optional[str] = None
+        self.timings: dict = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if self.backend is None:
+            raise ModelNotReady("Model is not loaded yet.")
+        return self.backend.predict(batch)
+
+    async def load(self):
+        """Builds and warms up the backend off the event loop, recording how long each step took."""
+        try:
+            self.status = "loading"
+            started = time.perf_counter()
+            backend = await asyncio.to_thread(self.build_backend)
+            loaded = time.perf_counter()
+
+            self.status = "warming_up"
+            await asyncio.to_thread(warm_up, backend, self.warmup_batch_sizes)
+            warmed = time.perf_counter()
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            print(f"ERROR: Model failed to load: {e}")
+            return
+
+        self.backend = backend
+        self.timings = {
+            "load_seconds": round(loaded - started, 3),
+            "warmup_seconds": round(warmed - loaded, 3),
+            "startup_seconds": round(warmed - PROCESS_STARTED, 3),
+        }
+        self.status = "ready"
+        print(
+            f"Model '{backend.name}' ready in {self.timings['startup_seconds']}s "
+            f"(load {self.timings['load_seconds']}s, warmup {self.timings['warmup_seconds']}s)."
+        )
+
+    def health(self) -> dict:
+        return {"status": self.status, "backend": self.backend.name if self.backend else None, "error": self.error, **self.timings}
@@ -0,0 +1,239 @@
+"""
+Content-addressed cache of image predictions.
+
+Results are keyed by the SHA-256 of the image bytes, so the same photo is only
+classified once no matter where it is stored. A URL -> hash index lets repeat
+URLs skip the download entirely. Entries live in an in-memory LRU, and
+optionally in a SQLite file that survives restarts.
+
+The event loop never waits on SQLite: disk reads run in a worker thread, and
+new results and access times are queued to a writer thread that saves them in
+batches, one commit per batch.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# Most rows the writer thread saves per commit
+WRITE_BATCH_SIZE = 500
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class PredictionCache:
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_urls: int = 50000,
+        disk_path: Optional[str] = None,
+        max_disk_entries: int = 500000,
+        namespace: str = "",
+    ):
+        """
+        `namespace` is mixed into every key; change it (e.g. model or mapping
+        version) to invalidate results produced by an older model.
+        """
+        self.max_entries = max_entries
+        self.max_urls = max_urls
+        self.max_disk_entries = max_disk_entries
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[str, dict]" = OrderedDict()
+        self._urls: "OrderedDict[str, str]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        self._disk_writes = 0
+
+        self.url_hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            writer_db = sqlite3.connect(disk_path, check_same_thread=False)
+            # WAL lets the reader connection see committed rows while the writer is busy
+            writer_db.execute("PRAGMA journal_mode=WAL")
+            writer_db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            writer_db.execute("CREATE INDEX IF NOT EXISTS predictions_accessed_at ON predictions (accessed_at)")
+            writer_db.commit()
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._writes = queue.Queue()
+            self._writer = threading.Thread(
+                target=self._write_loop, args=(writer_db,), name="prediction-cache-writer", daemon=True
+            )
+            self._writer.start()
+
+    def _key(self, digest: str) -> str:
+        return f"{self.namespace}:{digest}"
+
+    def _remember(self, key: str, result: dict):
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def _remember_url(self, url: str, digest: str):
+        self._urls[url] = digest
+        self._urls.move_to_end(url)
+        while len(self._urls) > self.max_urls:
+            self._urls.popitem(last=False)
+
+    def _lookup_memory(self, key: str) -> Optional[dict]:
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+        return result
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        """Runs in a worker thread. The hit's new access time goes to the writer rather than being committed here."""
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT result FROM predictions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._writes.put(("touch", key, time.time()))
+        return json.loads(row[0])
+
+    async def _lookup(self, key: str) -> Tuple[Optional[dict], Optional[str]]:
+        """Returns (result, tier it came from) without touching the hit counters."""
+        with self._lock:
+            result = self._lookup_memory(key)
+        if result is not None:
+            return result, "memory"
+
+        if self._db is not None:
+            result = await asyncio.to_thread(self._read_disk, key)
+            if result is not None:
+                with self._lock:
+                    self._remember(key, result)
+                return result, "disk"
+        return None, None
+
+    async def get_by_url(self, url: str) -> Optional[dict]:
+        """Returns the cached prediction for a URL whose content was seen before."""
+        with self._lock:
+            digest = self._urls.get(url)
+        if digest is None:
+            return None
+        result, _ = await self._lookup(self._key(digest))
+        if result is not None:
+            with self._lock:
+                self.url_hits += 1
+        return result
+
+    async def get(self, digest: str, url: Optional[str] = None) -> Optional[dict]:
+        """Returns the cached prediction for some image content, or None on a miss."""
+        result, tier = await self._lookup(self._key(digest))
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            if tier == "memory":
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+            if url is not None:
+                self._remember_url(url, digest)
+            return result
+
+    def put(self, digest: str, result: dict, url: Optional[str] = None):
+        """Caches a new prediction. Never blocks: the disk copy is saved by the writer thread."""
+        key = self._key(digest)
+        with self._lock:
+            self._remember(key, result)
+            if url is not None:
+                self._remember_url(url, digest)
+        if self._writes is not None:
+            self._writes.put(("put", key, json.dumps(result), time.time()))
+
+    def _write_loop(self, db: sqlite3.Connection):
+        """Writer thread: saves whatever has queued up since the last commit, in one transaction."""
+        while True:
+            item = self._writes.get()
+            batch: List[tuple] = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    break
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self._save(db, batch)
+                except sqlite3.Error as e:
+                    print(f"ERROR: Could not save {len(batch)} prediction cache rows: {e}")
+            if item is None:
+                db.close()
+                return
+
+    def _save(self, db: sqlite3.Connection, batch: List[tuple]):
+        rows = [item[1:] for item in batch if item[0] == "put"]
+        touched = [(item[2], item[1]) for item in batch if item[0] == "touch"]
+        if rows:
+            db.executemany("INSERT OR REPLACE INTO predictions (key, result, accessed_at) VALUES (?, ?, ?)", rows)
+        if touched:
+            db.executemany("UPDATE predictions SET accessed_at = ? WHERE key = ?", touched)
+        db.commit()
+
+        previous, self._disk_writes = self._disk_writes, self._disk_writes + len(rows)
+        # Trim the least recently used rows now and then rather than on every write
+        if previous // 1000 != self._disk_writes // 1000:
+            self._trim_disk(db)
+
+    def _trim_disk(self, db: sqlite3.Connection):
+        (count,) = db.execute("SELECT COUNT(*) FROM predictions").fetchone()
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            db.execute(
+                "DELETE FROM predictions WHERE key IN "
+                "(SELECT key FROM predictions ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+            db.commit()
+
+    def close(self):
+        """Saves the queued rows and closes the SQLite file."""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.url_hits + self.memory_hits + self.disk_hits + self.misses
+            hits = self.url_hits + self.memory_hits + self.disk_hits
+            return {
+                "entries": len(self._results),
+                "max_entries": self.max_entries,
+                "urls": len(self._urls),
+                "disk_enabled": self._db is not None,
+                "disk_writes_pending": self._writes.qsize() if self._writes is not None else 0,
+                "url_hits": self.url_hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else None,
+            }
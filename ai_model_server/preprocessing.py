@@ -0,0 +1,61 @@
+"""
+Image decode and preprocessing for inference.
+
+Phone photos are ~12 MP, but the model only needs 224 x 224. JPEGs are decoded
+in draft mode, which lets libjpeg scale by 1/2, 1/4 or 1/8 during decoding
+instead of materialising every pixel. Other formats use Pillow's reducing
+resize. Either way there is one resize and at most one colour conversion.
+Decoding produces compact uint8 arrays; the normalisation MobileNetV2 expects
+is written straight into the batcher's preallocated float32 batch buffer.
+"""
+import io
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+INPUT_SIZE: Tuple[int, int] = (224, 224)
+
+
+class ImageDecodeError(Exception):
+    """Raised when image bytes aren't a picture Pillow can read; retrying won't help."""
+
+
+def decode_to_input_size(data: bytes, size: Tuple[int, int] = INPUT_SIZE) -> np.ndarray:
+    """Decodes image bytes to an RGB uint8 array of shape (height, width, 3)."""
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format == "JPEG":
+            # Picks the smallest DCT scale that still yields at least `size`, and
+            # decodes straight to RGB (e.g. 4032x3024 decodes as 504x378).
+            image.draft("RGB", size)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        # reducing_gap shrinks by an integer factor first (cheap box filter) when
+        # the source is still much larger than the target, then resamples once.
+        image = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+    except Exception as e:
+        raise ImageDecodeError(f"Could not decode image: {e}") from e
+    return np.asarray(image, dtype=np.uint8)
+
+
+def normalize_into(image: np.ndarray, out: np.ndarray):
+    """
+    Writes MobileNetV2-normalised pixels (scaled to [-1, 1]) of a uint8 image into
+    `out`, a float32 slot of the batch buffer, without temporary arrays.
+    """
+    np.multiply(image, 1.0 / 127.5, out=out, casting="unsafe")
+    np.subtract(out, 1.0, out=out)
+
+
+class BatchBuffer:
+    """A reusable float32 input buffer for batches of up to `max_batch_size` images."""
+
+    def __init__(self, max_batch_size: int, size: Tuple[int, int] = INPUT_SIZE):
+        self._buffer = np.empty((max_batch_size, size[1], size[0], 3), dtype=np.float32)
+
+    def fill(self, images) -> np.ndarray:
+        """Normalises the images into the buffer and returns a view of the filled rows."""
+        for index, image in enumerate(images):
+            normalize_into(image, self._buffer[index])
+        return self._buffer[:len(images)]
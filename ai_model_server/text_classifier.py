@@ -0,0 +1,121 @@
+"""
+Text Classifier Module
+
+Keyword-based classification of report descriptions. Keywords are matched as
+whole words ("bin" no longer matches inside "cabinet") and weighted, so a
+specific phrase outweighs a word that also turns up in unrelated reports. Each
+hit adds its keyword's weight to its category; the highest-scoring category
+wins if it reaches `min_score`.
+
+All keywords are compiled into one regex, factored into a prefix trie
+("lamp(?:post| post)?"), so a description is scanned once. That is quicker
+than testing each weighted keyword in turn, but slower than the plain
+substring checks it replaced, which had neither weights nor word boundaries.
+
+The keyword table is a data file, text_keywords.json, shipped next to this
+module (TEXT_KEYWORDS_PATH overrides it). The backend and the AI model server
+are deployed separately, so each carries its own copy of both files; the
+copies must stay identical so both services classify a description the same
+way (backend/tests/test_text_classifier.py checks this).
+"""
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+GENERAL_CATEGORY = "General Inquiry"
+
+KEYWORDS_FILENAME = "text_keywords.json"
+
+
+KEYWORDS_PATH = os.getenv("TEXT_KEYWORDS_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), KEYWORDS_FILENAME
+)
+
+
+def load_keywords(path: str = KEYWORDS_PATH) -> Tuple[Dict[str, Dict[str, float]], float]:
+    """
+    Reads the keyword table: category -> {keyword or phrase: weight}, plus the
+    minimum score a category needs to win. Specific phrases weigh more than
+    words that also turn up in unrelated reports.
+    """
+    with open(path) as f:
+        config = json.load(f)
+    return config["categories"], float(config.get("min_score", 1.0))
+
+
+DEFAULT_KEYWORDS, DEFAULT_MIN_SCORE = load_keywords()
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """
+    Regex alternation matching exactly `terms`, sharing common prefixes. The
+    greedy optional groups try the longest keyword first, so "street light" wins
+    over "street" at the same position. Spaces match any run of whitespace.
+    """
+    root: dict = {}
+    for term in terms:
+        node = root
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}  # end of a keyword
+
+    def render(node: dict) -> str:
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + render(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return render(root)
+
+
+class TextClassifier:
+    def __init__(self, keywords: Dict[str, Dict[str, float]] = DEFAULT_KEYWORDS, min_score: float = DEFAULT_MIN_SCORE):
+        self.min_score = min_score
+        # keyword -> [(category, weight)]; a keyword may count toward several categories
+        weights = defaultdict(list)
+        for category, terms in keywords.items():
+            for term, weight in terms.items():
+                weights[self._normalize(term)].append((category, weight))
+        self._weights: Dict[str, List[Tuple[str, float]]] = dict(weights)
+
+        # Optional plural suffix, so "potholes" and "bushes" count without listing them.
+        # Text is lowercased before matching, which is much faster than re.IGNORECASE.
+        self._pattern = re.compile(rf"\b({_trie_pattern(self._weights)})(?:e?s)?\b")
+
+    @staticmethod
+    def _normalize(term: str) -> str:
+        return " ".join(term.lower().split())
+
+    def _lookup(self, matched: str) -> List[Tuple[str, float]]:
+        # Phrases matched across several spaces or a line break need normalising
+        return self._weights.get(matched) or self._weights[self._normalize(matched)]
+
+    def _decide(self, scores: Dict[str, float]) -> Tuple[str, float]:
+        if not scores:
+            return GENERAL_CATEGORY, 0.0
+        category = max(scores, key=scores.get)
+        if scores[category] < self.min_score:
+            return GENERAL_CATEGORY, 0.0
+        # Confidence: the winner's share of all keyword evidence in the text
+        return category, scores[category] / sum(scores.values())
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Total keyword weight per category found in `text`."""
+        scores: Dict[str, float] = defaultdict(float)
+        for match in self._pattern.finditer(text.lower()):
+            for category, weight in self._lookup(match.group(1)):
+                scores[category] += weight
+        return scores
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """Returns (category, confidence) for one description."""
+        return self._decide(self.scores(text or ""))
+
+
+text_classifier = TextClassifier()
@@ -0,0 +1,287 @@
+"""
+Multi-process inference worker pool.
+
+One Python process can't keep a many-core box busy: the GIL serialises the
+pre- and post-processing, and a single model instance scales poorly past a few
+intra-op threads. The pool runs `workers` processes instead, each with its own
+copy of the model pinned to a share of the cores. The dispatcher hands each
+batch to whichever worker is idle; batches only queue when all of them are busy.
+
+Batches travel to the workers as uint8 images (a quarter the size of the float
+input) and each worker normalises them into its own preallocated buffer.
+
+A worker that dies is restarted in the background, and its batch is retried
+once on another worker. The pool stops being ready while no worker is alive,
+and fails (so /health/live restarts the instance) if none could be restarted.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from inference_backends import create_backend
+from model_loader import PROCESS_STARTED, ModelNotReady, warm_up
+from preprocessing import BatchBuffer
+
+
+def available_cores() -> int:
+    """CPU cores this process may run on (respects container/affinity limits where the OS exposes them)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def threads_per_worker(workers: int, cores: Optional[int] = None) -> int:
+    """Splits the cores evenly so the workers' intra-op thread pools don't oversubscribe them."""
+    return max(1, (cores or available_cores()) // workers)
+
+
+def _worker_main(conn, backend_config: dict, max_batch_size: int):
+    """Entry point of a worker process: load, warm up, then serve batches until told to stop."""
+    threads = backend_config.get("intra_op_threads")
+    if threads:
+        # Also caps the OpenMP/BLAS pools some runtimes size from the environment
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+
+    try:
+        started = time.perf_counter()
+        backend = create_backend(**backend_config)
+        warm_up(backend, (1, max_batch_size))
+        buffer = BatchBuffer(max_batch_size)
+    except Exception as e:
+        conn.send(("failed", str(e)))
+        return
+    conn.send(("ready", round(time.perf_counter() - started, 3)))
+
+    while True:
+        try:
+            images = conn.recv()
+        except EOFError:
+            return
+        if images is None:
+            return
+        try:
+            conn.send(("ok", backend.predict(buffer.fill(images))))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class _Worker:
+    def __init__(self, index: int, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.batches = 0
+
+
+class InferenceWorkerPool:
+    """
+    Runs `workers` inference processes and dispatches batches to them. Has the
+    same load()/ready/health() surface as ModelLoader, and an async predict()
+    taking a stacked uint8 batch (N, H, W, 3).
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        backend_name: str,
+        model_dir: str = "./models/",
+        quantized: bool = False,
+        intra_op_threads: Optional[int] = None,
+        inter_op_threads: Optional[int] = None,
+        max_batch_size: int = 16,
+        dispatch_timeout: float = 30.0,
+    ):
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        # Longest a batch waits for an idle worker before failing
+        self.dispatch_timeout = dispatch_timeout
+        self.backend_config = {
+            "name": backend_name,
+            "model_dir": model_dir,
+            "quantized": quantized,
+            "intra_op_threads": intra_op_threads or threads_per_worker(workers),
+            # Inter-op parallelism just competes with the other workers for cores
+            "inter_op_threads": inter_op_threads or 1,
+        }
+        # spawn, not fork: forking a process that already has threads (or TensorFlow) loaded is unsafe
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: Dict[int, _Worker] = {}
+        self._idle: Optional[asyncio.Queue] = None
+        self._closing = False
+        self._respawning = 0
+        self.status = "starting"  # starting -> loading -> ready (<-> restarting while no worker is alive), or failed
+        self.error: Optional[str] = None
+        self.timings: dict = {}
+        self.restarts = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    async def load(self):
+        """Starts every worker and waits until all of them have loaded and warmed up their model."""
+        self._idle = asyncio.Queue()
+        self.status = "loading"
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self._spawn(index) for index in range(self.workers)), return_exceptions=True)
+        failures = [str(r) for r in results if isinstance(r, Exception)]
+        if failures:
+            self.status = "failed"
+            self.error = failures[0]
+            print(f"ERROR: {len(failures)} of {self.workers} inference workers failed to load: {self.error}")
+            return
+
+        self.timings = {
+            "load_seconds": round(time.perf_counter() - started, 3),
+            "worker_load_seconds": list(results),
+            "startup_seconds": round(time.perf_counter() - PROCESS_STARTED, 3),
+        }
+        self.status = "ready"
+        print(
+            f"{self.workers} '{self.backend_config['name']}' inference workers ready in {self.timings['startup_seconds']}s "
+            f"({self.backend_config['intra_op_threads']} threads each)."
+        )
+
+    async def _spawn(self, index: int) -> float:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.backend_config, self.max_batch_size),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+
+        message, detail = await asyncio.to_thread(parent_conn.recv)
+        if message != "ready":
+            process.join(timeout=5)
+            raise RuntimeError(f"worker {index}: {detail}")
+
+        worker = _Worker(index, process, parent_conn)
+        self._workers[index] = worker
+        self._idle.put_nowait(worker)
+        return detail
+
+    async def predict(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Runs one batch on the next idle worker, waiting for one to free up if all
+        are busy. If the worker dies mid-batch, the batch is retried once on another.
+        """
+        for _ in range(2):
+            worker = await self._next_worker()
+            round_trip = asyncio.ensure_future(asyncio.to_thread(self._round_trip, worker, batch))
+            try:
+                # Shielded: if the caller is cancelled, the thread still owns the pipe until the reply is in
+                status, result = await asyncio.shield(round_trip)
+            except (EOFError, BrokenPipeError, OSError) as e:
+                error = e
+                continue
+            finally:
+                round_trip.add_done_callback(lambda _, worker=worker, round_trip=round_trip: self._release(worker, round_trip))
+
+            worker.batches += 1
+            if status != "ok":
+                raise RuntimeError(result)
+            return result
+        raise RuntimeError(f"Inference worker {worker.index} died: {error}")
+
+    async def _next_worker(self) -> _Worker:
+        """
+        The next idle worker. Fails fast rather than waiting on a pool with no
+        live workers, including when the last one dies while this is waiting.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.dispatch_timeout
+        while self.ready:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise ModelNotReady(f"No inference worker became free within {self.dispatch_timeout}s.")
+            try:
+                # Wakes up now and then to notice the pool going down
+                return await asyncio.wait_for(self._idle.get(), min(remaining, 1.0))
+            except asyncio.TimeoutError:
+                continue
+        raise ModelNotReady(f"Inference workers are not ready ({self.status}).")
+
+    @staticmethod
+    def _round_trip(worker: _Worker, batch: np.ndarray):
+        worker.conn.send(batch)
+        return worker.conn.recv()
+
+    def _release(self, worker: _Worker, round_trip: asyncio.Future):
+        """Hands a worker back once its round trip is over, or replaces it if the pipe broke."""
+        error = None if round_trip.cancelled() else round_trip.exception()
+        if isinstance(error, (EOFError, BrokenPipeError, OSError)):
+            self._replace(worker)
+        else:
+            self._idle.put_nowait(worker)
+
+    @staticmethod
+    def _reap(worker: _Worker):
+        """Makes sure a failed worker's process is gone, killing it if it is still running."""
+        worker.conn.close()
+        worker.process.join(timeout=1)
+        if worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join(timeout=5)
+
+    def _replace(self, worker: _Worker):
+        """Restarts a crashed worker in the background; the pool runs one short until it is back."""
+        if self._closing:
+            return
+        del self._workers[worker.index]
+        self.restarts += 1
+        self._respawning += 1
+        if not self._workers and self.status == "ready":
+            self.status = "restarting"
+
+        async def respawn():
+            try:
+                # Joining may block for a moment, so it happens off the event loop
+                await asyncio.to_thread(self._reap, worker)
+                print(f"WARNING: Inference worker {worker.index} exited (code {worker.process.exitcode}); restarting it.")
+                await self._spawn(worker.index)
+            except Exception as e:
+                print(f"ERROR: Could not restart inference worker {worker.index}: {e}")
+                if not self._workers and self._respawning == 1:
+                    self.status = "failed"
+                    self.error = f"No inference worker could be restarted: {e}"
+            else:
+                if self.status == "restarting":
+                    self.status = "ready"
+            finally:
+                self._respawning -= 1
+
+        asyncio.create_task(respawn(), name=f"respawn-inference-worker-{worker.index}")
+
+    def close(self):
+        self._closing = True
+        for worker in self._workers.values():
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers.values():
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self._workers.clear()
+
+    def health(self) -> dict:
+        return {
+            "status": self.status,
+            "backend": self.backend_config["name"],
+            "error": self.error,
+            "workers": self.workers,
+            "workers_alive": len(self._workers),
+            "workers_restarting": self._respawning,
+            "threads_per_worker": self.backend_config["intra_op_threads"],
+            "batches_per_worker": {w.index: w.batches for w in self._workers.values()},
+            "restarts": self.restarts,
+            **self.timings,
+        }
@@ -5,23 +5,268 @@ This file contains the logic for classifying civic issue reports.
 It is designed to be easily updated to call a real, external AI model.
 """
 import os
+import time
+import asyncio
 import httpx
-from typing import List
+from collections import deque
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from text_classifier import text_classifier
+
+# (filename, content, content_type) of an image sent by bytes
+ImagePayload = Tuple[str, bytes, str]
 
 # --- Configuration for the Real AI Model ---
 # Your teammate will provide this URL. It's the address of their running AI service.
 # We use an environment variable for security and flexibility.
 REAL_AI_API_URL = os.getenv("AI_API_URL", "http://127.0.0.1:8001/api/classify") # Example URL
 
+# Endpoint that takes image bytes directly (multipart) instead of URLs
+REAL_AI_UPLOAD_URL = os.getenv("AI_UPLOAD_API_URL", REAL_AI_API_URL.rstrip("/") + "/upload")
+
+# "url": the AI service downloads images from storage. "bytes": the backend sends
+# the bytes it already has, skipping the second transfer.
+AI_CLASSIFY_MODE = os.getenv("AI_CLASSIFY_MODE", "url").lower()
+
 # A timeout for the API call to prevent our app from waiting indefinitely.
 AI_API_TIMEOUT = 10.0 # 10 seconds
 
+# Category returned whenever the AI service can't give an answer right now (worth retrying)
+FALLBACK_CATEGORY = "Classification Pending"
+
+# Returned when the AI service answered but rejected the report (a 4xx, e.g. 422
+# for images that won't decode). Retrying would fail the same way.
+UNCLASSIFIABLE = "Unclassifiable"
+
+# Connection pool for the long-lived client (keep-alive, optional HTTP/2)
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "20"))
+AI_KEEPALIVE_EXPIRY = float(os.getenv("AI_KEEPALIVE_EXPIRY", "30"))
+AI_HTTP2 = os.getenv("AI_HTTP2", "true").lower() == "true"
+
+# Circuit breaker: after this many consecutive failures, fail fast for the reset period
+AI_BREAKER_FAILURE_THRESHOLD = int(os.getenv("AI_BREAKER_FAILURE_THRESHOLD", "5"))
+AI_BREAKER_RESET_SECONDS = float(os.getenv("AI_BREAKER_RESET_SECONDS", "30"))
+
+# Hedged requests: if set, a second identical request is sent when the first has
+# not answered within this many seconds, and whichever finishes first wins.
+AI_HEDGE_DELAY = float(os.getenv("AI_HEDGE_DELAY", "0")) or None
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. Closed: calls go through. Open: calls are
+    rejected until `reset_seconds` pass. Half-open: one trial call decides
+    whether to close again or re-open.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._trial_in_flight or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def end_trial(self):
+        """Frees the half-open trial slot if its call ended without an outcome (e.g. it was cancelled)."""
+        self._trial_in_flight = False
+
+
+class AIClientMetrics:
+    """Counters and a sliding window of latencies for calls to the AI service."""
+
+    def __init__(self, window: int = 1000):
+        self.requests = 0
+        self.successes = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.short_circuited = 0
+        self.rejected = 0
+        self.hedged = 0
+        self._latencies = deque(maxlen=window)
+
+    def observe_latency(self, seconds: float):
+        self._latencies.append(seconds)
+
+    def snapshot(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "short_circuited": self.short_circuited,
+            "rejected": self.rejected,
+            "hedged": self.hedged,
+            "latency_ms": {"p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99)},
+        }
+
+
+_client: Optional[httpx.AsyncClient] = None
+breaker = CircuitBreaker(AI_BREAKER_FAILURE_THRESHOLD, AI_BREAKER_RESET_SECONDS)
+metrics = AIClientMetrics()
+
+
+async def start_ai_client():
+    """Creates the process-wide pooled client. Call once from the app lifespan."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=AI_HTTP2,
+            timeout=AI_API_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=AI_MAX_CONNECTIONS,
+                max_keepalive_connections=AI_MAX_CONNECTIONS,
+                keepalive_expiry=AI_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+
+async def close_ai_client():
+    """Closes the pooled client and its connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_ai_metrics() -> dict:
+    """Returns the AI client's counters, latency percentiles and breaker state."""
+    return {**metrics.snapshot(), "circuit_breaker": breaker.state}
+
+
+async def _post(url: str, **kwargs) -> httpx.Response:
+    """Posts to the AI service, hedging with a second request if AI_HEDGE_DELAY is set."""
+    if _client is None:
+        await start_ai_client()
+
+    if AI_HEDGE_DELAY is None:
+        return await _client.post(url, **kwargs)
+
+    primary = asyncio.create_task(_client.post(url, **kwargs))
+    done, _ = await asyncio.wait({primary}, timeout=AI_HEDGE_DELAY)
+    if done:
+        return primary.result()
+
+    metrics.hedged += 1
+    attempts = {primary, asyncio.create_task(_client.post(url, **kwargs))}
+    try:
+        while attempts:
+            done, attempts = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        # Both attempts failed; surface the primary's error
+        return primary.result()
+    finally:
+        for task in attempts:
+            task.cancel()
+
+
+async def _classify(send: Callable[[], Awaitable[httpx.Response]]) -> str:
+    """
+    Runs one classification call through the circuit breaker and metrics.
+    Returns the category; FALLBACK_CATEGORY if the AI service is unavailable
+    (worth retrying); or UNCLASSIFIABLE if it rejected the report (not worth it).
+    """
+    # Decided before allow(), which takes the half-open trial slot
+    is_trial = breaker.state == "half_open"
+    if not breaker.allow():
+        metrics.short_circuited += 1
+        return FALLBACK_CATEGORY
+
+    metrics.requests += 1
+    start = time.perf_counter()
+    try:
+        response = await send()
+    except httpx.TimeoutException as e:
+        breaker.record_failure()
+        metrics.errors += 1
+        metrics.timeouts += 1
+        print(f"--- AI ERROR: AI service timed out: {e} ---")
+        return FALLBACK_CATEGORY
+    except httpx.RequestError as e:
+        # This catches network errors (e.g., the AI service is down).
+        breaker.record_failure()
+        metrics.errors += 1
+        print(f"--- AI ERROR: Could not connect to AI service: {e} ---")
+        return FALLBACK_CATEGORY
+    finally:
+        metrics.observe_latency(time.perf_counter() - start)
+        if is_trial:
+            breaker.end_trial()
+
+    if response.status_code >= 500:
+        # The AI service (or the storage it downloads from) is failing; like timeouts
+        # and connection errors, this counts toward the circuit breaker
+        breaker.record_failure()
+        metrics.errors += 1
+        print(f"--- AI ERROR: AI service unavailable ({response.status_code}). ---")
+        return FALLBACK_CATEGORY
+
+    # Any other answer, even a 4xx, shows the service is up
+    breaker.record_success()
+    if response.is_error:
+        metrics.rejected += 1
+        print(f"--- AI ERROR: AI service rejected the report ({response.status_code}): {response.text[:200]} ---")
+        return UNCLASSIFIABLE
+
+    try:
+        # Assuming the AI returns JSON like: {"category": "Pothole"}
+        ai_category = response.json().get("category")
+    except Exception as e:
+        metrics.rejected += 1
+        print(f"--- AI ERROR: Invalid response from AI service: {e} ---")
+        return UNCLASSIFIABLE
+    metrics.successes += 1
+    
+    if not ai_category:
+        print("--- AI WARNING: AI service did not return a category. ---")
+        return "General Inquiry"
+        
+    return ai_category
+
+
 async def classify_report_with_real_ai(description: str, image_urls: List[str]) -> str:
     """
     Calls a real, external AI model to classify a report.
     
     This function sends the report's description and image URLs to the AI service
     and returns its classification. It includes error handling and a fallback.
+    While the circuit breaker is open it returns the fallback immediately.
 
     Args:
         description: The text description of the civic issue.
@@ -29,58 +274,38 @@ async def classify_report_with_real_ai(description: str, image_urls: List[str])
 
     Returns:
         A string representing the classified category from the AI model,
-        or a fallback category if the AI service fails.
+        FALLBACK_CATEGORY if the AI service is unavailable, or UNCLASSIFIABLE
+        if it rejected the report.
     """
-    try:
-        # We use an async HTTP client to avoid blocking our main application.
-        async with httpx.AsyncClient() as client:
-            # The data payload we will send to the AI model.
-            # Your teammate should define the exact structure they expect.
-            payload = {
-                "description": description,
-                "image_urls": image_urls
-            }
-            
-            print(f"--- Calling Real AI Service at {REAL_AI_API_URL} ---")
-            
-            # Make the POST request to the AI service.
-            response = await client.post(REAL_AI_API_URL, json=payload, timeout=AI_API_TIMEOUT)
-            
-            # Raise an exception if the AI service returns an error (like 500).
-            response.raise_for_status()
-            
-            # Assuming the AI returns JSON like: {"category": "Pothole"}
-            ai_category = response.json().get("category")
-            
-            if not ai_category:
-                print("--- AI WARNING: AI service did not return a category. ---")
-                return "General Inquiry"
-                
-            print(f"--- Real AI Responded with Category: {ai_category} ---")
-            return ai_category
+    payload = {
+        "description": description,
+        "image_urls": image_urls
+    }
+    return await _classify(lambda: _post(REAL_AI_API_URL, json=payload))
 
-    except httpx.RequestError as e:
-        # This catches network errors (e.g., the AI service is down).
-        print(f"--- AI ERROR: Could not connect to AI service: {e} ---")
-        return "Classification Pending"
-    except Exception as e:
-        # This catches all other errors (e.g., invalid response from AI).
-        print(f"--- AI ERROR: An unexpected error occurred: {e} ---")
-        return "Classification Pending"
 
-def classify_report_simulated(description: str) -> str:
+async def classify_report_with_image_bytes(description: str, images: List[ImagePayload]) -> str:
     """
-    Simulates an AI model classifying a report based on keywords.
+    Like classify_report_with_real_ai, but sends the image bytes the backend
+    already holds straight to the AI service's upload endpoint, so it doesn't
+    have to download them again from storage.
+
+    Args:
+        description: The text description of the civic issue.
+        images: (filename, content, content_type) for each image. The bytes
+            are handed to the HTTP client as-is, without copying.
+
+    Returns:
+        The classified category, FALLBACK_CATEGORY if the AI service is
+        unavailable, or UNCLASSIFIABLE if it rejected the report.
     """
-    description_lower = description.lower()
-    if any(keyword in description_lower for keyword in ["pothole", "hole", "crack", "road damage"]):
-        return "Pothole"
-    if any(keyword in description_lower for keyword in ["light", "lamp", "bulb", "streetlight"]):
-        return "Streetlight Outage"
-    if any(keyword in description_lower for keyword in ["garbage", "trash", "waste", "bin"]):
-        return "Waste Management"
-    if any(keyword in description_lower for keyword in ["tree", "branch", "overgrown"]):
-        return "Fallen Tree / Landscaping"
-    
-    return "General Inquiry"
+    files = [("images", image) for image in images]
+    return await _classify(lambda: _post(REAL_AI_UPLOAD_URL, data={"description": description}, files=files))
 
+def classify_report_by_text(description: str) -> str:
+    """
+    Classifies a report from its description alone, locally and in microseconds.
+    Used for reports without images, where the image model has nothing to go on.
+    """
+    category, _ = text_classifier.classify(description)
+    return category
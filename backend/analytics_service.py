@@ -0,0 +1,232 @@
+"""
+Analytics Service Module
+
+Keeps an in-process rollup of report counts by category, status and department,
+plus resolution-time aggregates, so the analytics and dashboard endpoints can
+answer without scanning the reports table. The rollup is updated incrementally
+as reports are classified or change status, and can be rebuilt from the
+database (reports plus the status-transition log) at any time.
+
+Each API worker process holds its own rollup; it is built at startup and can be
+rebuilt on demand through the analytics rebuild endpoint. Updates recorded
+while a rebuild is reading the database are replayed onto the new rollup, so
+nothing recorded during the rebuild is lost.
+"""
+import bisect
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# (category, status, department_id) as last seen for a report
+ReportKey = Tuple[Optional[str], Optional[str], Optional[int]]
+
+RESOLVED = "resolved"
+
+
+def parse_timestamp(value) -> datetime:
+    """Parses a Supabase timestamp string (or passes a datetime through)."""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+class ResolutionTimes:
+    """Sorted resolution durations (in seconds) with a running sum, for O(1) mean and median."""
+
+    def __init__(self):
+        self._values: List[float] = []
+        self._total = 0.0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, seconds: float):
+        bisect.insort(self._values, seconds)
+        self._total += seconds
+
+    def remove(self, seconds: float):
+        index = bisect.bisect_left(self._values, seconds)
+        if index < len(self._values) and self._values[index] == seconds:
+            del self._values[index]
+            self._total -= seconds
+
+    def mean(self) -> Optional[float]:
+        return self._total / len(self._values) if self._values else None
+
+    def median(self) -> Optional[float]:
+        count = len(self._values)
+        if not count:
+            return None
+        middle = count // 2
+        if count % 2:
+            return self._values[middle]
+        return (self._values[middle - 1] + self._values[middle]) / 2
+
+
+class ReportRollup:
+    """Thread-safe counters of reports by category, status and department."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.RLock()
+        # Records made while a rebuild is running, replayed onto the rebuilt rollup
+        self._pending: Optional[List[Tuple[dict, Optional[datetime]]]] = None
+        self._reports: Dict[int, ReportKey] = {}
+        self._by_category: Counter = Counter()
+        self._by_status: Counter = Counter()
+        self._by_department: Counter = Counter()
+        self._resolved_by_department: Counter = Counter()
+        # Resolution time of each currently-resolved report, overall and per department
+        self._resolution_seconds: Dict[int, float] = {}
+        self._resolution_times = ResolutionTimes()
+        self._resolution_times_by_department: Dict[int, ResolutionTimes] = defaultdict(ResolutionTimes)
+        self.is_built = False
+
+    @staticmethod
+    def _key(report: dict) -> ReportKey:
+        return report.get('category'), report.get('status'), report.get('department_id')
+
+    def _apply(self, key: ReportKey, delta: int):
+        category, status, department_id = key
+        if category:
+            self._by_category[category] += delta
+        if status:
+            self._by_status[status] += delta
+        if department_id is not None:
+            self._by_department[department_id] += delta
+            if status == RESOLVED:
+                self._resolved_by_department[department_id] += delta
+
+    def _add_resolution(self, report_id: int, department_id: Optional[int], seconds: float):
+        self._resolution_seconds[report_id] = seconds
+        self._resolution_times.add(seconds)
+        if department_id is not None:
+            self._resolution_times_by_department[department_id].add(seconds)
+
+    def _remove_resolution(self, report_id: int, department_id: Optional[int]) -> Optional[float]:
+        seconds = self._resolution_seconds.pop(report_id, None)
+        if seconds is None:
+            return None
+        self._resolution_times.remove(seconds)
+        if department_id is not None:
+            self._resolution_times_by_department[department_id].remove(seconds)
+        return seconds
+
+    def record(self, report: dict, resolved_at: Optional[datetime] = None):
+        """
+        Adds a report to the rollup, or moves its counts if it was already recorded.
+
+        Pass `resolved_at` when the report has just transitioned to resolved so its
+        resolution time (resolved_at - created_at) is added to the aggregates.
+        """
+        key = self._key(report)
+        report_id = report['id']
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((report, resolved_at))
+            previous = self._reports.get(report_id)
+            if previous == key and resolved_at is None:
+                return
+            seconds = None
+            if previous is not None:
+                self._apply(previous, -1)
+                seconds = self._remove_resolution(report_id, previous[2])
+            self._apply(key, 1)
+            self._reports[report_id] = key
+
+            if key[1] == RESOLVED:
+                if resolved_at is not None and report.get('created_at'):
+                    seconds = (resolved_at - parse_timestamp(report['created_at'])).total_seconds()
+                if seconds is not None:
+                    self._add_resolution(report_id, key[2], max(seconds, 0.0))
+
+    def get(self, report_id: int) -> Optional[ReportKey]:
+        """Returns the (category, status, department_id) last recorded for a report."""
+        with self._lock:
+            return self._reports.get(report_id)
+
+    def rebuild(self, load: Callable[[], Tuple[Iterable[List[dict]], Dict[int, datetime]]]):
+        """
+        Recomputes every aggregate from scratch. `load()` returns chunks of report
+        rows plus a map of report ids to the time of their latest transition to
+        resolved, as read from the status-transition log.
+
+        Reports recorded while this runs are applied to the current rollup as
+        usual and also replayed, in order, onto the rebuilt one before it is
+        swapped in.
+        """
+        with self._build_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                chunks, resolved_at = load()
+                fresh = ReportRollup()
+                for chunk in chunks:
+                    for report in chunk:
+                        fresh.record(report, resolved_at.get(report['id']))
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+
+            with self._lock:
+                for report, report_resolved_at in self._pending:
+                    fresh.record(report, report_resolved_at)
+                self._pending = None
+                self._reports = fresh._reports
+                self._by_category = fresh._by_category
+                self._by_status = fresh._by_status
+                self._by_department = fresh._by_department
+                self._resolved_by_department = fresh._resolved_by_department
+                self._resolution_seconds = fresh._resolution_seconds
+                self._resolution_times = fresh._resolution_times
+                self._resolution_times_by_department = fresh._resolution_times_by_department
+                self.is_built = True
+
+    def ensure_built(self, load: Callable[[], Tuple[Iterable[List[dict]], Dict[int, datetime]]]):
+        """Builds the rollup if it has never been built; concurrent callers wait for the running build."""
+        if self.is_built:
+            return
+        with self._build_lock:
+            if not self.is_built:
+                self.rebuild(load)
+
+    def snapshot(self) -> dict:
+        """Returns a consistent copy of the current counts, dropping zeroed keys."""
+        with self._lock:
+            return {
+                "total_reports": len(self._reports),
+                "reports_by_category": {k: v for k, v in self._by_category.items() if v > 0},
+                "reports_by_status": {k: v for k, v in self._by_status.items() if v > 0},
+                "reports_by_department": {k: v for k, v in self._by_department.items() if v > 0},
+                "resolved_by_department": {k: v for k, v in self._resolved_by_department.items() if v > 0},
+            }
+
+    def department_performance(self) -> List[dict]:
+        """
+        Returns resolved/total/rate and mean/median resolution time (seconds) for
+        every department that has reports assigned, highest total first.
+        """
+        with self._lock:
+            performance = []
+            for department_id, total in self._by_department.items():
+                if total <= 0:
+                    continue
+                resolved = self._resolved_by_department.get(department_id, 0)
+                times = self._resolution_times_by_department.get(department_id)
+                performance.append({
+                    "department_id": department_id,
+                    "resolved": resolved,
+                    "total": total,
+                    "rate": round(resolved / total * 100, 1),
+                    "mean_resolution_seconds": times.mean() if times else None,
+                    "median_resolution_seconds": times.median() if times else None,
+                })
+        performance.sort(key=lambda p: p["total"], reverse=True)
+        return performance
+
+    def resolution_time(self) -> Tuple[Optional[float], Optional[float]]:
+        """Returns the (mean, median) resolution time in seconds across all resolved reports."""
+        with self._lock:
+            return self._resolution_times.mean(), self._resolution_times.median()
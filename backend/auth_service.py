@@ -30,6 +30,8 @@ def get_password_hash(password: str) -> str:
 def create_access_token(data: dict) -> str:
     """
     Creates a new JWT access token.
+    Expected claims: "sub" (the user's email), plus "uid" and "name" so that
+    requests can identify the user without looking the email up.
     """
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -37,15 +39,15 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def decode_access_token(token: str) -> Optional[str]:
+def decode_access_token(token: str) -> Optional[dict]:
     """
-    Decodes a JWT and returns the user's email (or None if invalid).
+    Decodes a JWT and returns its claims (or None if invalid).
+    The user's email is always present under "sub".
     """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+        if payload.get("sub") is None:
             return None
-        return email
+        return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,58 @@
+"""
+Microbenchmark: scalar haversine loop vs. the vectorized batch engine.
+
+Usage (from the backend directory):
+    python benchmarks/bench_haversine.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geo_service import calculate_distance, nearest_within  # noqa: E402
+
+CENTER_LAT, CENTER_LON = 28.6139, 77.2090  # New Delhi
+RADIUS_KM = 10.0
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def scalar_loop(latitudes, longitudes):
+    return [
+        i for i, (lat, lon) in enumerate(zip(latitudes, longitudes))
+        if calculate_distance(CENTER_LAT, CENTER_LON, lat, lon) <= RADIUS_KM
+    ]
+
+
+def vectorized(latitudes, longitudes):
+    indices, _ = nearest_within(CENTER_LAT, CENTER_LON, latitudes, longitudes, radius_km=RADIUS_KM)
+    return indices
+
+
+def best_of(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(42)
+    print(f"{'points':>10} {'loop (ms)':>12} {'numpy (ms)':>12} {'speedup':>9}")
+    for size in SIZES:
+        # Points scattered over roughly a 100km square around the center.
+        latitudes = CENTER_LAT + rng.uniform(-0.5, 0.5, size)
+        longitudes = CENTER_LON + rng.uniform(-0.5, 0.5, size)
+        # The API builds its arrays from Python lists of report rows, so time that input.
+        lat_list, lon_list = latitudes.tolist(), longitudes.tolist()
+
+        loop_time = best_of(scalar_loop, lat_list, lon_list, repeat=1 if size >= 1_000_000 else 3)
+        numpy_time = best_of(vectorized, lat_list, lon_list)
+        print(f"{size:>10,} {loop_time * 1000:>12.1f} {numpy_time * 1000:>12.1f} {loop_time / numpy_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: description classification throughput, the old chain of
+`any(keyword in text)` scans (and the same naive scan over the full weighted
+keyword table) vs. the compiled TextClassifier, on a large synthetic corpus.
+
+Usage (from the backend directory):
+    python benchmarks/bench_text_classifier.py [corpus_size]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_classifier import DEFAULT_KEYWORDS, TextClassifier  # noqa: E402
+
+FILLER = (
+    "the near our street since last week please fix it urgently residents are complaining "
+    "children walk here every day opposite market behind school corner main road lane"
+).split()
+
+
+def classify_substring_scan(description: str) -> str:
+    """The previous classify_report_simulated, for reference."""
+    description_lower = description.lower()
+    if any(keyword in description_lower for keyword in ["pothole", "hole", "crack", "road damage"]):
+        return "Pothole"
+    if any(keyword in description_lower for keyword in ["light", "lamp", "bulb", "streetlight"]):
+        return "Streetlight Outage"
+    if any(keyword in description_lower for keyword in ["garbage", "trash", "waste", "bin"]):
+        return "Waste Management"
+    if any(keyword in description_lower for keyword in ["tree", "branch", "overgrown"]):
+        return "Fallen Tree / Landscaping"
+    return "General Inquiry"
+
+
+def weighted_substring_scan(description: str) -> str:
+    """A naive scan with the same keyword table: one substring test per keyword."""
+    description_lower = description.lower()
+    scores = {}
+    for category, terms in DEFAULT_KEYWORDS.items():
+        score = sum(weight for term, weight in terms.items() if term in description_lower)
+        if score:
+            scores[category] = score
+    return max(scores, key=scores.get) if scores else "General Inquiry"
+
+
+def synthetic_corpus(size: int):
+    """Descriptions of 10-60 words: filler plus 0-3 keywords from random categories."""
+    rng = random.Random(0)
+    keywords = [term for terms in DEFAULT_KEYWORDS.values() for term in terms]
+    corpus = []
+    for _ in range(size):
+        words = rng.choices(FILLER, k=rng.randint(10, 60))
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords).capitalize())
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def timed(label: str, fn, corpus):
+    start = time.perf_counter()
+    fn(corpus)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<30} {elapsed * 1000:>9.1f} ms {len(corpus) / elapsed:>12,.0f} docs/s")
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    corpus = synthetic_corpus(size)
+    classifier = TextClassifier()
+    print(f"{size:,} descriptions, {sum(len(d) for d in corpus) / size:.0f} chars on average")
+
+    timed("substring scan (old, 15 kw)", lambda docs: [classify_substring_scan(d) for d in docs], corpus)
+    timed("substring scan (all keywords)", lambda docs: [weighted_substring_scan(d) for d in docs], corpus)
+    timed("TextClassifier.classify", lambda docs: [classifier.classify(d) for d in docs], corpus)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Load test: concurrent-request throughput against a running backend worker.
+
+Start a single worker (uvicorn main:app --workers 1) and run this once on the
+old code and once on the new code to compare requests/second and latency.
+
+Usage (from the backend directory):
+    python benchmarks/load_test.py --token <jwt> --image sample.jpg
+    python benchmarks/load_test.py --token <jwt> --path /api/reports/ --method GET
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+REPORT_DATA = {
+    "description": "Load test report: large pothole near the bus stop",
+    "latitude": 28.6139,
+    "longitude": 77.2090,
+}
+
+
+async def send(client: httpx.AsyncClient, args, image_bytes):
+    start = time.perf_counter()
+    if args.method == "POST":
+        response = await client.post(
+            args.path,
+            data={"report_data_json": json.dumps(REPORT_DATA)},
+            files=[("images", ("load_test.jpg", image_bytes, "image/jpeg"))],
+        )
+    else:
+        response = await client.get(args.path)
+    return response.status_code, time.perf_counter() - start
+
+
+async def run(args):
+    image_bytes = b""
+    if args.image:
+        with open(args.image, "rb") as f:
+            image_bytes = f.read()
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, limits=limits, timeout=60.0) as client:
+        async def bounded():
+            async with semaphore:
+                return await send(client, args, image_bytes)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies = [latency for _, latency in results]
+    # quantiles() needs two samples; with one, it is its own p95
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    errors = sum(1 for status, _ in results if status >= 400)
+    print(f"{args.method} {args.path}: {args.requests} requests, concurrency {args.concurrency}")
+    print(f"  throughput: {args.requests / elapsed:.1f} req/s ({errors} errors)")
+    print(f"  latency p50: {statistics.median(latencies) * 1000:.0f} ms, "
+          f"p95: {p95 * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/api/reports/")
+    parser.add_argument("--method", choices=["GET", "POST"], default="POST")
+    parser.add_argument("--token", help="JWT from /api/auth/login")
+    parser.add_argument("--image", help="Image file to attach to submitted reports")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
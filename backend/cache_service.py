@@ -0,0 +1,146 @@
+"""
+Cache Service Module
+
+A small thread-safe LRU cache with per-entry time-to-live, used to keep hot
+lookups (e.g. authenticated users) out of the database, and a versioned
+read-through cache for small tables served with ETags.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire `ttl_seconds` after being set."""
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the cached value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """Stores a value, evicting the least recently used entry if the cache is full."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Drops a single entry, if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drops every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+def strong_etag(value: Any) -> str:
+    """A strong ETag for a JSON-serialisable value: a hash of its canonical JSON form."""
+    body = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header value covers `etag` (a list of tags or "*").
+    Uses weak comparison (RFC 7232), so W/"<hash>" from a proxy that re-encoded
+    the response still matches.
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in tags:
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == opaque for tag in tags)
+
+
+class VersionedTableCache:
+    """
+    Read-through cache of a whole small table, as a list of rows keyed by `key`.
+
+    `load()` fetches every row. The rows, the collection's ETag and each row's
+    ETag are computed once per load. Writes call `invalidate()`, which bumps the
+    version, so a load that was already running when the write happened is not
+    stored. Entries also expire after `ttl_seconds`, to pick up changes made
+    outside this process.
+    """
+
+    def __init__(self, load: Callable[[], List[dict]], key: str = "id", ttl_seconds: float = 300.0):
+        self.load = load
+        self.key = key
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entry: Optional[dict] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _current(self) -> dict:
+        with self._lock:
+            entry = self._entry
+            if entry is not None and entry["expires_at"] > time.monotonic():
+                self.hits += 1
+                return entry
+            self.misses += 1
+            version = self._version
+
+        rows = self.load()
+        entry = {
+            "rows": rows,
+            "etag": strong_etag(rows),
+            "by_key": {row[self.key]: (row, strong_etag(row)) for row in rows},
+            "expires_at": time.monotonic() + self.ttl_seconds,
+        }
+        with self._lock:
+            if self._version == version:
+                self._entry = entry
+        return entry
+
+    def get_all(self) -> Tuple[List[dict], str]:
+        """Every row, and the ETag of the whole collection."""
+        entry = self._current()
+        return entry["rows"], entry["etag"]
+
+    def get(self, key: Hashable) -> Optional[Tuple[dict, str]]:
+        """One row and its ETag, or None if there is no such row."""
+        return self._current()["by_key"].get(key)
+
+    def invalidate(self):
+        """Drops the cached table; the next read reloads it."""
+        with self._lock:
+            self._version += 1
+            self._entry = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"version": self._version, "cached": self._entry is not None, "hits": self.hits, "misses": self.misses}
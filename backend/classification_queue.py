@@ -0,0 +1,204 @@
+"""
+Classification Queue Module
+
+Runs report classification in the background so report submission can return
+as soon as the report is stored. Jobs go into a bounded in-process queue that a
+pool of worker tasks drains; failed jobs are retried with exponential backoff.
+"""
+import asyncio
+import random
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+
+@dataclass
+class ClassificationJob:
+    report_id: int
+    description: str
+    image_urls: List[str] = field(default_factory=list)
+    # Optional (filename, content, content_type) of each image, to classify without a download
+    images: Optional[List[Tuple[str, bytes, str]]] = None
+    attempt: int = 0
+
+    @property
+    def image_bytes(self) -> int:
+        return sum(len(content) for _, content, _ in self.images or ())
+
+
+class ClassificationRetry(Exception):
+    """
+    Raised by a job handler when classification should be retried later.
+    `retry_after` sets a minimum delay, e.g. until the AI client's circuit breaker may close.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ClassificationQueue:
+    """
+    Bounded queue of classification jobs processed by `workers` concurrent tasks.
+
+    `handler` does the actual work for one job. If it raises, the job is put back
+    on the queue after an exponential backoff, up to `max_attempts` times per
+    submission; after that the report is left pending for the next recovery
+    sweep. Errors other than ClassificationRetry are also counted per report
+    across submissions: once a report has failed `max_total_attempts` times,
+    `on_exhausted` is called to give it a final outcome instead of retrying it
+    forever. ClassificationRetry (e.g. the AI service is down) never counts
+    there, so an outage of any length leaves reports pending, not finalised.
+
+    Image bytes carried by queued jobs are capped at `max_image_bytes` in total;
+    a job submitted past the cap drops its bytes and is classified from its URLs.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[ClassificationJob], Awaitable[None]],
+        workers: int = 4,
+        maxsize: int = 1000,
+        max_attempts: int = 5,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        max_total_attempts: Optional[int] = None,
+        on_exhausted: Optional[Callable[[ClassificationJob], Awaitable[None]]] = None,
+        max_image_bytes: int = 128 * 1024 * 1024,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.max_total_attempts = max_total_attempts or max_attempts * 3
+        self.on_exhausted = on_exhausted
+        self.max_image_bytes = max_image_bytes
+        # Image bytes held by jobs still waiting in the queue
+        self._image_bytes = 0
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._queue: "asyncio.Queue[ClassificationJob]" = asyncio.Queue(maxsize=maxsize)
+        self._tasks: List[asyncio.Task] = []
+        self._retry_tasks: Set[asyncio.Task] = set()
+        # Report ids queued, in flight or waiting to retry, so sweeps don't duplicate them
+        self._active_ids: Set[int] = set()
+        # Failed attempts per report (outages excluded), kept across recovery sweeps until it is resolved
+        self._total_attempts: Dict[int, int] = {}
+        self.completed = 0
+        self.failed = 0
+        self.exhausted = 0
+
+    def start(self):
+        """Starts the worker tasks on the running event loop."""
+        for index in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"classification-worker-{index}"))
+
+    async def stop(self):
+        """Cancels the workers and any pending retries. Unfinished reports stay pending."""
+        for task in [*self._tasks, *self._retry_tasks]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retry_tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._retry_tasks.clear()
+
+    def submit(self, job: ClassificationJob) -> bool:
+        """
+        Enqueues a job without waiting. Returns False if the report is already
+        being handled or the queue is full (the recovery sweep will pick it up).
+        """
+        if job.report_id in self._active_ids:
+            return False
+        if job.images and self._image_bytes + job.image_bytes > self.max_image_bytes:
+            # A backlog is building up; don't hold its photos in memory
+            job.images = None
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            print(f"WARNING: Classification queue full; report {job.report_id} left pending.")
+            return False
+        self._image_bytes += job.image_bytes
+        self._active_ids.add(job.report_id)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "active": len(self._active_ids),
+            "queued_image_bytes": self._image_bytes,
+            "completed": self.completed,
+            "failed": self.failed,
+            "exhausted": self.exhausted,
+            "retrying_reports": len(self._total_attempts),
+        }
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            self._image_bytes -= job.image_bytes
+            try:
+                await self.handler(job)
+                self.completed += 1
+                self._finish(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._handle_failure(job, e)
+            finally:
+                self._queue.task_done()
+
+    def _finish(self, job: ClassificationJob):
+        self._active_ids.discard(job.report_id)
+        self._total_attempts.pop(job.report_id, None)
+
+    async def _handle_failure(self, job: ClassificationJob, error: Exception):
+        job.attempt += 1
+        total = self._total_attempts.get(job.report_id, 0)
+        if not isinstance(error, ClassificationRetry):
+            total += 1
+            self._total_attempts[job.report_id] = total
+
+        if total >= self.max_total_attempts:
+            print(f"ERROR: Report {job.report_id} failed classification {total} times: {error}. Giving it a final outcome.")
+            self.exhausted += 1
+            try:
+                if self.on_exhausted is not None:
+                    await self.on_exhausted(job)
+            except Exception as e:
+                # Left pending; the count is kept, so the next sweep tries on_exhausted again
+                print(f"ERROR: Could not finalise report {job.report_id}: {e}")
+                self._active_ids.discard(job.report_id)
+                return
+            self._finish(job)
+            return
+
+        if job.attempt >= self.max_attempts:
+            print(f"ERROR: Giving up on classifying report {job.report_id} after {job.attempt} attempts: {error}")
+            self.failed += 1
+            self._active_ids.discard(job.report_id)
+            return
+
+        # Exponential backoff with jitter, so a recovering AI server isn't hit all at once
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (job.attempt - 1))
+        delay *= random.uniform(0.5, 1.0)
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after:
+            delay = max(delay, retry_after * random.uniform(1.0, 1.2))
+        print(f"WARNING: Classification of report {job.report_id} failed ({error}); retrying in {delay:.1f}s.")
+        task = asyncio.create_task(self._requeue_after(job, delay))
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    async def _requeue_after(self, job: ClassificationJob, delay: float):
+        await asyncio.sleep(delay)
+        await self._queue.put(job)
+        self._image_bytes += job.image_bytes
+
+
+async def run_periodically(interval_seconds: float, fn: Callable[[], Awaitable[None]], name: Optional[str] = None):
+    """Calls `fn` every `interval_seconds` until cancelled, logging (not raising) its errors."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await fn()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"ERROR: Periodic task {name or fn.__name__} failed: {e}")
@@ -0,0 +1,170 @@
+"""
+Geo Service Module
+
+Helpers for location-based report queries: a bounding-box calculator, a grid
+of ~2 km cells (each report's cell is stored and indexed, see migration 001)
+so radius searches can be pre-filtered to the cells around the center, and a
+vectorized haversine engine that computes exact distances for all surviving
+candidates in one NumPy pass.
+"""
+import math
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+
+# Grid cells are GEO_CELL_DEGREES on a side; must match the geo_cell column in migration 001
+GEO_CELL_DEGREES = 0.02
+GEO_CELL_COLUMNS = 18000  # 360 / GEO_CELL_DEGREES
+GEO_CELL_ROWS = 9000  # 180 / GEO_CELL_DEGREES
+# Past this many cells (very large radii) the cell list stops paying for itself
+MAX_GEO_CELLS = 400
+
+
+class BoundingBox(NamedTuple):
+    min_lat: float
+    max_lat: float
+    min_lon: float
+    max_lon: float
+
+    @property
+    def crosses_antimeridian(self) -> bool:
+        """True when the box wraps around the +/-180 meridian (min_lon > max_lon)."""
+        return self.min_lon > self.max_lon
+
+
+def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Calculate the great circle distance between two points 
+    on the earth (specified in decimal degrees)
+    Returns distance in kilometers
+    """
+    lat1_rad = math.radians(lat1)
+    lon1_rad = math.radians(lon1)
+    lat2_rad = math.radians(lat2)
+    lon2_rad = math.radians(lon2)
+
+    dlat = lat2_rad - lat1_rad
+    dlon = lon2_rad - lon1_rad
+    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+
+    return EARTH_RADIUS_KM * c
+
+
+def haversine_distances(
+    center_lat: float,
+    center_lon: float,
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+) -> np.ndarray:
+    """
+    Returns the great circle distance in kilometers from one center to every
+    (latitude, longitude) pair, computed in a single vectorized pass.
+    """
+    lat_rad = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon_rad = np.radians(np.asarray(longitudes, dtype=np.float64))
+    center_lat_rad = math.radians(center_lat)
+
+    a = (
+        np.sin((lat_rad - center_lat_rad) * 0.5) ** 2
+        + math.cos(center_lat_rad) * np.cos(lat_rad) * np.sin((lon_rad - math.radians(center_lon)) * 0.5) ** 2
+    )
+    # Clip guards against a > 1 from floating point error on antipodal points.
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_within(
+    center_lat: float,
+    center_lon: float,
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+    radius_km: Optional[float] = None,
+    k: Optional[int] = None,
+    sort: bool = False,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the points within `radius_km` of the center (all points if None).
+
+    If `k` is given, only the k nearest of those are kept, using a partial
+    sort so the cost stays linear. Results are ordered nearest first when
+    `k` is given or `sort` is True; otherwise they keep their input order.
+
+    Returns:
+        A tuple of (indices into the input arrays, distances in kilometers).
+    """
+    distances = haversine_distances(center_lat, center_lon, latitudes, longitudes)
+    if radius_km is not None:
+        indices = np.flatnonzero(distances <= radius_km)
+    else:
+        indices = np.arange(distances.size)
+
+    if k is not None and k < indices.size:
+        nearest = np.argpartition(distances[indices], k)[:k]
+        indices = indices[nearest]
+        sort = True
+
+    if sort:
+        indices = indices[np.argsort(distances[indices], kind="stable")]
+
+    return indices, distances[indices]
+
+
+def bounding_box(center_lat: float, center_lon: float, radius_km: float) -> BoundingBox:
+    """
+    Returns the smallest lat/lon box that contains every point within
+    `radius_km` of the center. Longitudes are wrapped into [-180, 180], so the
+    box may cross the antimeridian; if it reaches a pole, all longitudes are included.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE_LAT
+    min_lat = center_lat - delta_lat
+    max_lat = center_lat + delta_lat
+
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        # The circle covers a pole, so every meridian passes through it.
+        return BoundingBox(max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0)
+
+    # Widest longitude span happens at the latitude edge closest to a pole.
+    delta_lon = math.degrees(
+        math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(center_lat))))
+    )
+    if delta_lon >= 180.0:
+        return BoundingBox(min_lat, max_lat, -180.0, 180.0)
+
+    min_lon = center_lon - delta_lon
+    max_lon = center_lon + delta_lon
+    if min_lon < -180.0:
+        min_lon += 360.0
+    if max_lon > 180.0:
+        max_lon -= 360.0
+
+    return BoundingBox(min_lat, max_lat, min_lon, max_lon)
+
+
+def geo_cell(latitude: float, longitude: float) -> int:
+    """The grid cell of a point: row (from the south pole) * GEO_CELL_COLUMNS + column (from -180)."""
+    row = min(int(math.floor((latitude + 90.0) / GEO_CELL_DEGREES)), GEO_CELL_ROWS - 1)
+    column = min(int(math.floor((longitude + 180.0) / GEO_CELL_DEGREES)), GEO_CELL_COLUMNS - 1)
+    return row * GEO_CELL_COLUMNS + column
+
+
+def cells_covering(box: BoundingBox, max_cells: int = MAX_GEO_CELLS) -> Optional[List[int]]:
+    """
+    Every grid cell that overlaps `box`, or None if there would be more than
+    `max_cells`. One cell of margin on each side absorbs rounding differences
+    between this and the database's computation of a report's cell.
+    """
+    min_row = max(0, geo_cell(box.min_lat, 0.0) // GEO_CELL_COLUMNS - 1)
+    max_row = min(GEO_CELL_ROWS - 1, geo_cell(box.max_lat, 0.0) // GEO_CELL_COLUMNS + 1)
+    min_column = geo_cell(-90.0, box.min_lon) - 1
+    max_column = geo_cell(-90.0, box.max_lon) + 1
+    if box.crosses_antimeridian:
+        max_column += GEO_CELL_COLUMNS
+
+    width = max_column - min_column + 1
+    if width >= GEO_CELL_COLUMNS or width * (max_row - min_row + 1) > max_cells:
+        return None
+    columns = [column % GEO_CELL_COLUMNS for column in range(min_column, max_column + 1)]
+    return [row * GEO_CELL_COLUMNS + column for row in range(min_row, max_row + 1) for column in columns]
@@ -2,15 +2,19 @@ import os
 import os
 import json
 import uuid
-import math
-from datetime import datetime
-from collections import Counter, defaultdict
+import base64
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict
 from dotenv import load_dotenv
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from enum import Enum
 
 # FastAPI Imports
-from fastapi import FastAPI, APIRouter, HTTPException, Form, UploadFile, File, Security, Query, Depends, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Form, UploadFile, File, Security, Query, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 from fastapi.responses import JSONResponse
@@ -21,9 +25,27 @@ from pydantic import BaseModel, Field, EmailStr
 
 # Supabase Imports
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
 
 # Local Module Imports
-from ai_service import classify_report_with_real_ai
+from ai_service import (
+    classify_report_with_real_ai,
+    classify_report_with_image_bytes,
+    classify_report_by_text,
+    AI_CLASSIFY_MODE,
+    FALLBACK_CATEGORY,
+    UNCLASSIFIABLE,
+    AI_BREAKER_RESET_SECONDS,
+    ImagePayload,
+    start_ai_client,
+    close_ai_client,
+    get_ai_metrics
+)
+from analytics_service import ReportRollup, parse_timestamp
+from cache_service import TTLCache, VersionedTableCache, etag_matches
+from classification_queue import ClassificationJob, ClassificationQueue, ClassificationRetry, run_periodically
+from geo_service import bounding_box, cells_covering, nearest_within
+from routing_service import RoutingTable
 from auth_service import (
     verify_password, 
     get_password_hash, 
@@ -45,31 +67,157 @@ if not all([SUPABASE_URL, SUPABASE_KEY, API_SECRET_KEY, AI_API_URL]):
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# --- Data Access Layer ---
+# The Supabase client is synchronous. Async routes must never call it directly:
+# blocking calls run on this bounded pool so the event loop keeps serving requests.
+# (Plain `def` routes are already run in FastAPI's own threadpool.)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "16"))
+db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="supabase")
+
+# How many of a report's images are uploaded to storage at the same time
+IMAGE_UPLOAD_CONCURRENCY = int(os.getenv("IMAGE_UPLOAD_CONCURRENCY", "4"))
+# Largest image accepted with a report (the AI server's default download limit)
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+
+async def run_db(fn, *args, **kwargs):
+    """Runs a blocking Supabase call on the DB thread pool and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(fn, *args, **kwargs))
+
+async def db_execute(query):
+    """Executes a Supabase query builder without blocking the event loop."""
+    return await run_db(query.execute)
+
+# In-process counts of reports by category/status/department for analytics
+report_rollup = ReportRollup()
+
 
-# --- Helper Functions ---
-def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+# --- Pagination Helpers ---
+# Report listings are ordered by (created_at, id) descending. Keyset cursors encode
+# the last row seen so the next page is an index range scan, however deep it is.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+LOCATION_SCAN_CHUNK_SIZE = int(os.getenv("LOCATION_SCAN_CHUNK_SIZE", "500"))
+
+def encode_cursor(report: dict) -> str:
+    """Builds an opaque cursor pointing just past the given report."""
+    raw = json.dumps([report['created_at'], report['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Parses a cursor into its (created_at, id) key, rejecting anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, report_id = json.loads(raw)
+        datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        return created_at, int(report_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+def page_start(cursor: Optional[str], skip: int, limit: Optional[int]) -> Optional[Tuple[str, int]]:
     """
-    Calculate the great circle distance between two points 
-    on the earth (specified in decimal degrees)
-    Returns distance in kilometers
+    Decodes the cursor of a listing request, if any. A cursor already says where
+    the page starts, so it can't be combined with an offset; an offset needs a
+    page size, since a listing without one returns every row.
     """
-    # Convert decimal degrees to radians
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
-    
-    # Haversine formula
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    if skip and limit is None:
+        raise HTTPException(status_code=400, detail="skip requires limit.")
+    if not cursor:
+        return None
+    if skip:
+        raise HTTPException(status_code=400, detail="Use either cursor or skip, not both.")
+    return decode_cursor(cursor)
+
+def keyset_order(query, after: Optional[Tuple[str, int]] = None):
+    """Orders a reports query by (created_at, id) descending, starting after the given key."""
+    if after:
+        created_at, report_id = after
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{report_id})')
+    return query.order("created_at", desc=True).order("id", desc=True)
+
+def fetch_page(query, after: Optional[Tuple[str, int]], skip: int, limit: int) -> Tuple[List[dict], bool]:
+    """
+    Fetches one page from a keyset-ordered query: a ranged query for skip/limit,
+    or a plain limit after the cursor (skip is then always 0, see page_start). One extra row is requested to tell whether
+    a next page exists. Returns (reports, has_more).
+    """
+    if after:
+        rows = query.limit(limit + 1).execute().data or []
+    else:
+        rows = query.range(skip, skip + limit).execute().data or []
+    return rows[:limit], len(rows) > limit
+
+def iter_report_chunks(build_query, after: Optional[Tuple[str, int]] = None, chunk_size: int = LOCATION_SCAN_CHUNK_SIZE):
+    """
+    Streams the rows of a reports query in keyset order, one chunk per round trip.
+    `build_query` must return a fresh, filtered query each time it is called.
+    """
+    while True:
+        rows = keyset_order(build_query(), after).limit(chunk_size).execute().data or []
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        after = (rows[-1]['created_at'], rows[-1]['id'])
+
+def load_rollup():
+    """
+    Streams what the analytics rollup needs: the counted columns of every report,
+    plus the latest transition to resolved per report from the status-transition log.
+    """
+    resolved_at = {}
+    last_id = 0
+    while True:
+        rows = (
+            supabase.table("report_status_transitions").select("id, report_id, changed_at")
+            .eq("to_status", ReportStatus.RESOLVED.value).gt("id", last_id).order("id").limit(5000)
+            .execute().data or []
+        )
+        for row in rows:
+            resolved_at[row['report_id']] = parse_timestamp(row['changed_at'])
+        if len(rows) < 5000:
+            break
+        last_id = rows[-1]['id']
     
-    # Radius of earth in kilometers
-    r = 6371
-    distance = r * c
+    chunks = iter_report_chunks(
+        lambda: supabase.table("reports").select("id, created_at, category, status, department_id"),
+        chunk_size=5000,
+    )
+    return chunks, resolved_at
+
+def previous_statuses(report_ids: List[int]) -> Dict[int, Optional[str]]:
+    """
+    Current status of each report, before a status update: from the rollup once
+    it is built, otherwise (e.g. while it is still building after a restart)
+    with one query instead of waiting for the full build.
+    """
+    if report_rollup.is_built:
+        return {report_id: (report_rollup.get(report_id) or (None, None, None))[1] for report_id in report_ids}
+    rows = supabase.table("reports").select("id, status").in_("id", report_ids).execute().data or []
+    statuses = {row['id']: row['status'] for row in rows}
+    return {report_id: statuses.get(report_id) for report_id in report_ids}
+
+def format_duration(seconds: Optional[float]) -> str:
+    """Formats a duration for the dashboard, e.g. '3.2 days' or '5.5 hours'."""
+    if seconds is None:
+        return "N/A"
+    if seconds >= 86400:
+        return f"{seconds / 86400:.1f} days"
+    return f"{seconds / 3600:.1f} hours"
+
+def attach_image_urls(reports: List[dict]) -> List[dict]:
+    """Fills in `image_urls` for the given reports with a single report_images query."""
+    if not reports:
+        return reports
+    report_ids = [r['id'] for r in reports]
+    images_res = supabase.table("report_images").select("report_id, image_url").in_("report_id", report_ids).execute()
     
-    return distance
+    images_map = defaultdict(list)
+    for image in images_res.data:
+        images_map[image['report_id']].append(image['image_url'])
+        
+    for report in reports:
+        report['image_urls'] = images_map.get(report['id'], [])
+    return reports
 
 
 # --- Security Middleware ---
@@ -95,20 +243,40 @@ async def get_api_key(api_key: str = Security(api_key_header)):
 # OAuth2 / JWT for User Authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Authenticated users keyed by email, so steady-state requests make no DB call
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+user_cache = TTLCache(maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")), ttl_seconds=USER_CACHE_TTL_SECONDS)
+
+def invalidate_user(email: str):
+    """Drops a cached user. Call whenever an account is created, changed or removed."""
+    user_cache.invalidate(email)
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     """
     Dependency to get the current user from a JWT.
     This will be used to protect user-specific routes.
     """
-    email = decode_access_token(token)
-    if not email:
+    claims = decode_access_token(token)
+    if not claims:
         raise HTTPException(status_code=401, detail="Invalid authentication token")
     
-    # Fetch the user from the database
-    user_res = supabase.table("users").select("id, email, name").eq("email", email).single().execute()
-    if not user_res.data:
+    email = claims["sub"]
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+    
+    # Cache miss: tokens carry the user id, so look up by primary key.
+    # Older tokens only have the email.
+    query = supabase.table("users").select("id, email, name")
+    if claims.get("uid") is not None:
+        query = query.eq("id", claims["uid"])
+    else:
+        query = query.eq("email", email)
+    user_res = await db_execute(query.maybe_single())
+    if not user_res or not user_res.data or user_res.data['email'] != email:
         raise HTTPException(status_code=401, detail="User not found")
-        
+    
+    user_cache.set(email, user_res.data)
     return user_res.data
 
 
@@ -140,6 +308,10 @@ class ReportData(BaseModel):
     latitude: float = Field(..., ge=-90.0, le=90.0)
     longitude: float = Field(..., ge=-180.0, le=180.0)
 
+class ImageUploadError(BaseModel):
+    filename: str
+    error: str
+
 class ReportResponse(BaseModel):
     id: int
     created_at: datetime
@@ -151,10 +323,31 @@ class ReportResponse(BaseModel):
     image_urls: List[str] = []
     department_id: Optional[int] = None
     user_id: Optional[int] = None # Added user_id
+    distance_km: Optional[float] = None # Only set for location-filtered queries
+    image_errors: List[ImageUploadError] = [] # Only set on submission, for images that failed
 
 class ReportStatusUpdate(BaseModel):
     status: ReportStatus
 
+MAX_BULK_REPORTS = 500
+
+class BulkReportUpdate(BaseModel):
+    report_ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_REPORTS)
+    # At least one of these must be set
+    status: Optional[ReportStatus] = None
+    department_id: Optional[int] = None
+
+class BulkReportResult(BaseModel):
+    id: int
+    updated: bool
+    error: Optional[str] = None
+    report: Optional[ReportResponse] = None
+
+class BulkReportUpdateResponse(BaseModel):
+    updated: int
+    failed: int
+    results: List[BulkReportResult]
+
 class AnalyticsData(BaseModel):
     total_reports: int
     reports_by_category: Dict[str, int]
@@ -172,11 +365,14 @@ class DepartmentPerformance(BaseModel):
     resolved: int
     total: int
     rate: float
+    avgResolutionTime: str = "N/A"
+    medianResolutionTime: str = "N/A"
 
 class KpiData(BaseModel):
     totalReports: int
     reportsResolved: int
     avgResolutionTime: str
+    medianResolutionTime: str = "N/A"
     activeDepartments: int
 
 class DashboardData(BaseModel):
@@ -220,6 +416,7 @@ def register_user(user: UserCreate):
     insert_res = supabase.table("users").insert(new_user_data).execute()
     if not insert_res.data:
         raise HTTPException(status_code=500, detail="Could not create user account.")
+    invalidate_user(user.email)
         
     return {"message": "User registered successfully"}
 
@@ -233,13 +430,155 @@ def login_for_access_token(form_data: UserLogin):
     if not verify_password(form_data.password, user['hashed_password']):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
         
-    access_token = create_access_token(data={"sub": user['email']})
+    access_token = create_access_token(data={"sub": user['email'], "uid": user['id'], "name": user['name']})
+    # Warm the cache so the first authenticated request needs no lookup
+    user_cache.set(user['email'], {"id": user['id'], "email": user['email'], "name": user['name']})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+# --- Background Classification ---
+CLASSIFICATION_PENDING = FALLBACK_CATEGORY
+CLASSIFICATION_SWEEP_INTERVAL_SECONDS = float(os.getenv("CLASSIFICATION_SWEEP_INTERVAL_SECONDS", "300"))
+
+# Category -> department rules, held in memory and reloaded every ROUTING_REFRESH_SECONDS
+# (or via POST /api/routing/refresh). DEFAULT_DEPARTMENT_ID catches categories without a rule.
+ROUTING_REFRESH_SECONDS = float(os.getenv("ROUTING_REFRESH_SECONDS", "300"))
+routing_table = RoutingTable(
+    lambda: supabase.table("category_department_mapping").select("category_name, department_id").execute().data or [],
+    default_department_id=int(os.getenv("DEFAULT_DEPARTMENT_ID", "0")) or None,
+)
+
+async def refresh_routing_table() -> int:
+    rules = await run_db(routing_table.refresh)
+    print(f"--- Routing table loaded: {rules} category rules ---")
+    return rules
+
+async def store_classification(report_id: int, category: str):
+    """Routes a classified report to its department and stores both on the report."""
+    if not routing_table.loaded:
+        # Startup load failed (e.g. database briefly unreachable); retry before routing
+        await refresh_routing_table()
+    update_data = {"category": category, "department_id": routing_table.department_for(category)}
+    update_res = await db_execute(supabase.table("reports").update(update_data).eq("id", report_id))
+    if not update_res.data:
+        raise RuntimeError(f"Failed to update report {report_id} with AI classification.")
+    
+    report_rollup.record(update_res.data[0])
+
+async def classify_and_route(job: ClassificationJob):
+    """
+    Worker step for one report: classify it with the AI service (or, without
+    images, from its description), look up the department for the category
+    and store both on the report.
+    """
+    # Image bytes are only used on the first attempt; retries fall back to the stored
+    # URLs so jobs waiting out a backoff don't keep the bytes in memory.
+    images, job.images = job.images, None
+    if not images and not job.image_urls:
+        # Nothing for the image model to look at: classify the description locally
+        ai_category = classify_report_by_text(job.description)
+    elif images:
+        ai_category = await classify_report_with_image_bytes(job.description, images)
+    else:
+        ai_category = await classify_report_with_real_ai(job.description, job.image_urls)
+    if ai_category == CLASSIFICATION_PENDING:
+        # Wait at least as long as an open circuit breaker stays open
+        raise ClassificationRetry("AI service unavailable", retry_after=AI_BREAKER_RESET_SECONDS)
+    if ai_category == UNCLASSIFIABLE:
+        # The AI service rejected the report (e.g. undecodable images); retrying won't help
+        print(f"WARNING: AI service could not classify report {job.report_id}; using its description instead.")
+        ai_category = classify_report_by_text(job.description)
+    
+    await store_classification(job.report_id, ai_category)
+
+async def finalize_unclassified(job: ClassificationJob):
+    """Final outcome for a report that kept failing classification: classify it from its description."""
+    await store_classification(job.report_id, classify_report_by_text(job.description))
+
+async def recover_pending_classifications():
+    """
+    Re-queues every report still waiting for classification, e.g. after a crash
+    or after its job ran out of retries.
+    """
+    # Skip very recent reports: their submission may still be uploading images
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=60)).isoformat()
+    
+    def load_pending():
+        pending = []
+        for chunk in iter_report_chunks(
+            lambda: supabase.table("reports").select("id, created_at, description")
+            .eq("category", CLASSIFICATION_PENDING).lt("created_at", cutoff)
+        ):
+            pending.extend(attach_image_urls(chunk))
+        return pending
+    
+    pending = await run_db(load_pending)
+    queued = sum(
+        classification_queue.submit(ClassificationJob(r['id'], r['description'], r['image_urls']))
+        for r in pending
+    )
+    if pending:
+        print(f"--- Recovery sweep: {len(pending)} pending reports, {queued} queued for classification ---")
+
+classification_queue = ClassificationQueue(
+    classify_and_route,
+    workers=int(os.getenv("CLASSIFICATION_WORKERS", "4")),
+    maxsize=int(os.getenv("CLASSIFICATION_QUEUE_SIZE", "1000")),
+    max_attempts=int(os.getenv("CLASSIFICATION_MAX_ATTEMPTS", "5")),
+    # Across recovery sweeps, not counting AI outages; after this many failures the description decides
+    max_total_attempts=int(os.getenv("CLASSIFICATION_MAX_TOTAL_ATTEMPTS", "15")),
+    on_exhausted=finalize_unclassified,
+    # Total image bytes queued jobs may hold in "bytes" mode; past it, jobs use the URLs
+    max_image_bytes=int(os.getenv("CLASSIFICATION_MAX_IMAGE_BYTES", str(128 * 1024 * 1024))),
+)
+
+
 # --- Reports Router (Now with User Authentication) ---
 reports_router = APIRouter(prefix="/api/reports", tags=["Reports"])
 
+async def upload_report_images(report_id: int, images: List[ImagePayload]) -> Tuple[List[str], List[dict]]:
+    """
+    Uploads a report's images, given as (filename, content, content_type), to
+    storage concurrently (at most IMAGE_UPLOAD_CONCURRENCY at a time), then
+    records all of them with a single bulk report_images insert.
+    Returns the public URLs of the stored images, in upload order, and a list of
+    per-image errors.
+    """
+    semaphore = asyncio.Semaphore(IMAGE_UPLOAD_CONCURRENCY)
+    
+    async def upload(image: ImagePayload) -> Optional[str]:
+        filename, file_content, content_type = image
+        file_ext = filename.split('.')[-1]
+        file_name = f"{report_id}_{uuid.uuid4()}.{file_ext}"
+        async with semaphore:
+            await run_db(supabase.storage.from_("report-images").upload, file=file_content, path=file_name, file_options={"content-type": content_type})
+        return supabase.storage.from_("report-images").get_public_url(file_name)
+    
+    results = await asyncio.gather(*(upload(image) for image in images), return_exceptions=True)
+    
+    uploaded = []
+    image_errors = []
+    for (filename, _, _), result in zip(images, results):
+        if isinstance(result, Exception):
+            print(f"ERROR: Failed to upload image {filename}: {result}")
+            image_errors.append({"filename": filename, "error": str(result)})
+        else:
+            uploaded.append((filename, result))
+    
+    if not uploaded:
+        return [], image_errors
+    
+    try:
+        await db_execute(supabase.table("report_images").insert(
+            [{"report_id": report_id, "image_url": url} for _, url in uploaded]
+        ))
+    except Exception as e:
+        print(f"ERROR: Failed to record images for report {report_id}: {e}")
+        image_errors.extend({"filename": filename, "error": f"Uploaded but not recorded: {e}"} for filename, _ in uploaded)
+        return [], image_errors
+    
+    return [url for _, url in uploaded], image_errors
+
 @reports_router.post("/", status_code=201, response_model=ReportResponse)
 async def submit_report(
     report_data_json: str = Form(...),
@@ -251,151 +590,227 @@ async def submit_report(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid JSON format: {e}")
 
+    image_payloads = []
+    for image in images:
+        # Reads at most one byte past the limit, so an oversized upload isn't buffered whole
+        content = await image.read(MAX_IMAGE_BYTES + 1)
+        if len(content) > MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image {image.filename} exceeds the {MAX_IMAGE_BYTES} byte limit.")
+        image_payloads.append((image.filename, content, image.content_type))
+
     # Step 1: Save the report with the user's ID
     initial_db_data = report_data.model_dump()
-    initial_db_data['category'] = "Classification Pending"
+    initial_db_data['category'] = CLASSIFICATION_PENDING
     initial_db_data['user_id'] = current_user['id'] # <-- Link report to the user
     
-    report_res = supabase.table("reports").insert(initial_db_data).execute()
+    report_res = await db_execute(supabase.table("reports").insert(initial_db_data))
     if not report_res.data:
         raise HTTPException(status_code=500, detail="Failed to save initial report.")
     
-    # ... (Keep the rest of the image upload and AI logic the same)
     report_id = report_res.data[0]['id']
+    report_rollup.record(report_res.data[0])
     
-    uploaded_image_urls = []
-    for image in images:
-        file_ext = image.filename.split('.')[-1]
-        file_name = f"{report_id}_{uuid.uuid4()}.{file_ext}"
-        try:
-            file_content = await image.read()
-            supabase.storage.from_("report-images").upload(file=file_content, path=file_name, file_options={"content-type": image.content_type})
-            public_url = supabase.storage.from_("report-images").get_public_url(file_name)
-            uploaded_image_urls.append(public_url)
-            supabase.table("report_images").insert({"report_id": report_id, "image_url": public_url}).execute()
-        except Exception as e:
-            print(f"ERROR: Failed to upload image {image.filename}: {e}")
-            continue
+    uploaded_image_urls, image_errors = await upload_report_images(report_id, image_payloads)
     
-    ai_category = await classify_report_with_real_ai(report_data.description, uploaded_image_urls)
+    # Step 2: Classify and route in the background; the citizen gets the stored report right away.
+    # In "bytes" mode the job carries the image bytes so the AI service needn't download them again
+    # (unless the queue already holds its limit of image bytes).
+    classification_queue.submit(ClassificationJob(
+        report_id, report_data.description, uploaded_image_urls,
+        images=image_payloads if AI_CLASSIFY_MODE == "bytes" else None
+    ))
     
-    department_id = None
-    try:
-        mapping_res = supabase.table("category_department_mapping").select("department_id").eq("category_name", ai_category).single().execute()
-        if mapping_res.data:
-            department_id = mapping_res.data['department_id']
-    except Exception as e:
-        print(f"WARNING: No routing rule for category '{ai_category}'. Error: {e}")
-
-    update_data = {"category": ai_category, "department_id": department_id}
-    update_res = supabase.table("reports").update(update_data).eq("id", report_id).execute()
-    
-    if not update_res.data:
-        raise HTTPException(status_code=500, detail="Failed to update report with AI classification.")
-    
-    final_report = update_res.data[0]
+    final_report = report_res.data[0]
     final_report['image_urls'] = uploaded_image_urls
+    final_report['image_errors'] = image_errors
     return final_report
 
 
 @reports_router.get("/", response_model=List[ReportResponse])
 def get_user_reports(
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header."),
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Page size. Omit to get all reports."),
     current_user: dict = Depends(get_current_user) # <-- Protect the route
 ):
     """
-    Retrieves all reports submitted by the currently authenticated user.
+    Retrieves the reports submitted by the currently authenticated user, newest first.
+    When paginated, the next page's cursor is returned in the X-Next-Cursor header.
     """
     user_id = current_user['id']
-    query = supabase.table("reports").select("*").eq("user_id", user_id)
+    after = page_start(cursor, skip, limit)
+    query = keyset_order(supabase.table("reports").select("*").eq("user_id", user_id), after)
     
-    # (The rest of the logic to get images remains the same)
-    reports_res = query.order("created_at", desc=True).execute()
-    if not reports_res.data:
-        return []
-    
-    reports = reports_res.data
-    report_ids = [r['id'] for r in reports]
-    images_res = supabase.table("report_images").select("report_id, image_url").in_("report_id", report_ids).execute()
+    if limit is None:
+        reports = query.execute().data or []
+        return attach_image_urls(reports)
     
-    images_map = defaultdict(list)
-    for image in images_res.data:
-        images_map[image['report_id']].append(image['image_url'])
-        
-    for report in reports:
-        report['image_urls'] = images_map.get(report['id'], [])
-        
-    return reports
+    reports, has_more = fetch_page(query, after, skip, limit)
+    if has_more:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(reports[-1])
+    return attach_image_urls(reports)
 
 # The public, filterable endpoint for the admin dashboard remains
 @reports_router.get("/all", response_model=List[ReportResponse])
 def get_all_reports_for_admin(
-    # ... (Keep the existing filtering and pagination logic)
+    response: Response,
     status: Optional[ReportStatus] = Query(None, description="Filter reports by their status."),
     category: Optional[str] = Query(None, description="Filter reports by their category."),
     department_id: Optional[int] = Query(None, description="Filter reports by department ID."),
     # Location filtering parameters
     center_lat: Optional[float] = Query(None, description="Center latitude for location filtering."),
     center_lon: Optional[float] = Query(None, description="Center longitude for location filtering."),
-    radius_km: Optional[float] = Query(10.0, description="Radius in kilometers for location filtering (default: 10km)."),
+    radius_km: Optional[float] = Query(10.0, gt=0, description="Radius in kilometers for location filtering (default: 10km)."),
+    sort_by_distance: bool = Query(False, description="Sort location-filtered reports by distance_km (nearest first)."),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header."),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100)
 ):
-    query = supabase.table("reports").select("*")
-    if status:
-        query = query.eq("status", status.value)
-    if category:
-        query = query.eq("category", category)
-    if department_id:
-        query = query.eq("department_id", department_id)
-    
-    reports_res = query.order("created_at", desc=True).execute()
-    if not reports_res.data:
-        return []
+    location_filter = center_lat is not None and center_lon is not None
+    if cursor and location_filter and sort_by_distance:
+        raise HTTPException(status_code=400, detail="Cursor pagination is not supported when sorting by distance; use skip/limit.")
+    after = page_start(cursor, skip, limit)
+    
+    def base_query():
+        query = supabase.table("reports").select("*")
+        if status:
+            query = query.eq("status", status.value)
+        if category:
+            query = query.eq("category", category)
+        if department_id:
+            query = query.eq("department_id", department_id)
+        if location_filter:
+            # Let the database discard everything outside the enclosing box first: the
+            # grid cells around the center are an index lookup (reports_geo_cell_idx);
+            # for very large radii, the latitude band is (reports_lat_lon_idx). Only
+            # survivors get the exact check.
+            box = bounding_box(center_lat, center_lon, radius_km)
+            cells = cells_covering(box)
+            if cells is not None:
+                query = query.in_("geo_cell", cells)
+            query = query.gte("latitude", box.min_lat).lte("latitude", box.max_lat)
+            if box.crosses_antimeridian:
+                query = query.or_(f"longitude.gte.{box.min_lon},longitude.lte.{box.max_lon}")
+            elif box.min_lon > -180.0 or box.max_lon < 180.0:
+                query = query.gte("longitude", box.min_lon).lte("longitude", box.max_lon)
+        return query
     
-    reports = reports_res.data
-    
-    # Apply location filtering if coordinates are provided
-    if center_lat is not None and center_lon is not None:
-        filtered_reports = []
-        for report in reports:
-            if report.get('latitude') is not None and report.get('longitude') is not None:
-                distance = calculate_distance(
-                    center_lat, center_lon, 
-                    report['latitude'], report['longitude']
-                )
-                if distance <= radius_km:
-                    # Add distance to report for potential sorting
-                    report['distance_km'] = round(distance, 2)
-                    filtered_reports.append(report)
-        reports = filtered_reports
-    
-    # Apply pagination after filtering
-    paginated_reports = reports[skip:skip + limit]
-    
-    # Get images for the paginated reports
-    if paginated_reports:
-        report_ids = [r['id'] for r in paginated_reports]
-        images_res = supabase.table("report_images").select("report_id, image_url").in_("report_id", report_ids).execute()
+    if not location_filter:
+        reports, has_more = fetch_page(keyset_order(base_query(), after), after, skip, limit)
+    else:
+        # Stream bounding-box candidates in keyset order and apply the exact radius
+        # check chunk by chunk, stopping as soon as the page (plus one) is filled.
+        # Distance ordering needs every candidate, which the bounding box keeps small.
+        wanted = skip + limit + 1
+        matches = []
+        for chunk in iter_report_chunks(base_query, after):
+            located = [r for r in chunk if r.get('latitude') is not None and r.get('longitude') is not None]
+            indices, distances = nearest_within(
+                center_lat, center_lon,
+                [r['latitude'] for r in located],
+                [r['longitude'] for r in located],
+                radius_km=radius_km,
+            )
+            for index, distance in zip(indices.tolist(), distances.tolist()):
+                report = located[index]
+                report['distance_km'] = round(distance, 2)
+                matches.append(report)
+            if not sort_by_distance and len(matches) >= wanted:
+                break
         
-        images_map = defaultdict(list)
-        for image in images_res.data:
-            images_map[image['report_id']].append(image['image_url'])
-            
-        for report in paginated_reports:
-            report['image_urls'] = images_map.get(report['id'], [])
+        if sort_by_distance:
+            matches.sort(key=lambda r: r['distance_km'])
+        reports = matches[skip:skip + limit]
+        has_more = len(matches) > skip + limit
+    
+    if has_more and reports and not sort_by_distance:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(reports[-1])
     
-    return paginated_reports
+    return attach_image_urls(reports)
 
 
 # We will keep the old API Key security for the admin-only status update endpoint
+@reports_router.put("/bulk", response_model=BulkReportUpdateResponse, dependencies=[Security(get_api_key)])
+def bulk_update_reports(bulk_update: BulkReportUpdate):
+    """
+    Sets the status and/or department of many reports at once, e.g. when a field
+    crew closes a batch of issues. One set-based update covers every report, the
+    status transitions are logged with one insert and the images of all updated
+    reports are fetched with one query. Returns a result per requested id, in
+    order. Requires API key for admin access.
+    """
+    update_data = {}
+    if bulk_update.status is not None:
+        update_data["status"] = bulk_update.status.value
+    if bulk_update.department_id is not None:
+        if departments_cache.get(bulk_update.department_id) is None:
+            raise HTTPException(status_code=400, detail=f"Department with ID {bulk_update.department_id} not found.")
+        update_data["department_id"] = bulk_update.department_id
+    if not update_data:
+        raise HTTPException(status_code=400, detail="Provide a status and/or a department_id to apply.")
+    
+    report_ids = list(dict.fromkeys(bulk_update.report_ids))
+    previous = previous_statuses(report_ids)
+    changed_at = datetime.now(timezone.utc)
+    
+    response = supabase.table("reports").update(update_data).in_("id", report_ids).execute()
+    updated_reports = {report['id']: report for report in response.data or []}
+    
+    transitions = []
+    for report_id, report in updated_reports.items():
+        previous_status = previous[report_id]
+        status_changed = previous_status != report['status']
+        if status_changed:
+            transitions.append({
+                "report_id": report_id,
+                "from_status": previous_status,
+                "to_status": report['status'],
+                "changed_at": changed_at.isoformat()
+            })
+        is_newly_resolved = status_changed and report['status'] == ReportStatus.RESOLVED.value
+        report_rollup.record(report, resolved_at=changed_at if is_newly_resolved else None)
+    
+    if transitions:
+        # Log the transitions so resolution times can be rebuilt later
+        try:
+            supabase.table("report_status_transitions").insert(transitions).execute()
+        except Exception as e:
+            print(f"WARNING: Failed to log {len(transitions)} status transitions: {e}")
+    
+    attach_image_urls(list(updated_reports.values()))
+    results = [
+        BulkReportResult(id=report_id, updated=True, report=updated_reports[report_id])
+        if report_id in updated_reports
+        else BulkReportResult(id=report_id, updated=False, error=f"Report with ID {report_id} not found.")
+        for report_id in report_ids
+    ]
+    return {"updated": len(updated_reports), "failed": len(report_ids) - len(updated_reports), "results": results}
+
 @reports_router.put("/{id}/status", response_model=ReportResponse, dependencies=[Security(get_api_key)])
 def update_report_status(id: int, status_update: ReportStatusUpdate):
-    # (This function remains the same)
+    previous_status = previous_statuses([id])[id]
+    changed_at = datetime.now(timezone.utc)
+    
     response = supabase.table("reports").update({"status": status_update.status.value}).eq("id", id).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail=f"Report with ID {id} not found.")
     
     updated_report = response.data[0]
+    if previous_status != updated_report['status']:
+        # Log the transition so resolution times can be rebuilt later
+        try:
+            supabase.table("report_status_transitions").insert({
+                "report_id": id,
+                "from_status": previous_status,
+                "to_status": updated_report['status'],
+                "changed_at": changed_at.isoformat()
+            }).execute()
+        except Exception as e:
+            print(f"WARNING: Failed to log status transition for report {id}: {e}")
+    
+    is_newly_resolved = updated_report['status'] == ReportStatus.RESOLVED.value and previous_status != updated_report['status']
+    report_rollup.record(updated_report, resolved_at=changed_at if is_newly_resolved else None)
     images_res = supabase.table("report_images").select("image_url").eq("report_id", id).execute()
     updated_report['image_urls'] = [img['image_url'] for img in images_res.data]
     
@@ -405,104 +820,157 @@ def update_report_status(id: int, status_update: ReportStatusUpdate):
 analytics_router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
 @analytics_router.get("/", response_model=AnalyticsData)
 def get_analytics():
-    response = supabase.table("reports").select("category, status").execute()
-    all_reports = response.data
+    report_rollup.ensure_built(load_rollup)
+    counts = report_rollup.snapshot()
     return {
-        "total_reports": len(all_reports),
-        "reports_by_category": Counter(r['category'] for r in all_reports if r['category']),
-        "reports_by_status": Counter(r['status'] for r in all_reports if r['status'])
+        "total_reports": counts["total_reports"],
+        "reports_by_category": counts["reports_by_category"],
+        "reports_by_status": counts["reports_by_status"]
     }
 
+@analytics_router.post("/rebuild", dependencies=[Security(get_api_key)])
+def rebuild_analytics():
+    """Recomputes the analytics rollup from the reports table. Requires API key for admin access."""
+    report_rollup.rebuild(load_rollup)
+    return {"message": "Analytics rollup rebuilt.", "total_reports": report_rollup.snapshot()["total_reports"]}
+
 # Dashboard Router
 dashboard_router = APIRouter(prefix="/api/dashboard", tags=["Dashboard"])
 
 # Departments Router
 departments_router = APIRouter(prefix="/api/departments", tags=["Departments"])
 
+# The departments table is small and only changes through the write endpoints below,
+# which invalidate this cache; reads are served from memory with strong ETags.
+departments_cache = VersionedTableCache(
+    lambda: supabase.table("departments").select("*").order("name").execute().data or [],
+    ttl_seconds=float(os.getenv("DEPARTMENTS_CACHE_TTL_SECONDS", "300")),
+)
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Sets the ETag on the response, and returns an empty 304 response instead
+    if the client already holds this version.
+    """
+    # no-cache: clients may store the response but must revalidate it every time
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
 @departments_router.get("/", response_model=List[DepartmentResponse])
-def get_all_departments():
+def get_all_departments(request: Request, response: Response):
     """Get all departments sorted alphabetically by name."""
-    response = supabase.table("departments").select("*").order("name").execute()
-    return response.data or []
+    departments, etag = departments_cache.get_all()
+    return not_modified(request, response, etag) or departments
 
 @departments_router.get("/{department_id}", response_model=DepartmentResponse)
-def get_department(department_id: int):
+def get_department(department_id: int, request: Request, response: Response):
     """Get a specific department by ID."""
-    response = supabase.table("departments").select("*").eq("id", department_id).single().execute()
-    if not response.data:
+    cached = departments_cache.get(department_id)
+    if cached is None:
         raise HTTPException(status_code=404, detail=f"Department with ID {department_id} not found.")
+    department, etag = cached
+    return not_modified(request, response, etag) or department
+
+def department_write_error(e: APIError, action: str) -> HTTPException:
+    """Translates a failed department write into the API's error responses."""
+    if e.code == "23505":
+        # Unique violation; the message names the constraint, while the details
+        # quote the conflicting value, which may itself contain "email"
+        field = "email" if "departments_email_key" in (e.message or "") else "name"
+        return HTTPException(status_code=400, detail=f"Department with this {field} already exists.")
+    print(f"ERROR: Failed to {action} department: {e}")
+    return HTTPException(status_code=500, detail=f"Failed to {action} department.")
+
+MAX_BULK_DEPARTMENTS = 500
+
+@departments_router.post("/bulk", response_model=List[DepartmentResponse], dependencies=[Security(get_api_key)])
+def bulk_upsert_departments(departments: List[DepartmentCreate]):
+    """
+    Creates or updates many departments in one request, e.g. when onboarding a
+    municipality. Departments are matched by name: existing ones get the new
+    email, the rest are created. Requires API key for admin access.
+    """
+    if not departments:
+        return []
+    if len(departments) > MAX_BULK_DEPARTMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_DEPARTMENTS} departments per request.")
+    for field in ("name", "email"):
+        values = [getattr(d, field) for d in departments]
+        if len(set(values)) != len(values):
+            raise HTTPException(status_code=400, detail=f"Duplicate department {field}s in request.")
+    
+    try:
+        response = supabase.table("departments").upsert(
+            [d.model_dump() for d in departments], on_conflict="name"
+        ).execute()
+    except APIError as e:
+        raise department_write_error(e, "import")
+    departments_cache.invalidate()
     return response.data
 
 @departments_router.post("/", status_code=201, response_model=DepartmentResponse, dependencies=[Security(get_api_key)])
 def create_department(department: DepartmentCreate):
     """Create a new department. Requires API key for admin access."""
-    # Check if department with same name already exists
-    existing_dept = supabase.table("departments").select("id").eq("name", department.name).execute()
-    if existing_dept.data:
-        raise HTTPException(status_code=400, detail="Department with this name already exists.")
-    
-    # Check if email is already used
-    existing_email = supabase.table("departments").select("id").eq("email", department.email).execute()
-    if existing_email.data:
-        raise HTTPException(status_code=400, detail="Department with this email already exists.")
-    
-    response = supabase.table("departments").insert(department.model_dump()).execute()
+    # Name and email uniqueness are enforced by the database (migration 005)
+    try:
+        response = supabase.table("departments").insert(department.model_dump()).execute()
+    except APIError as e:
+        raise department_write_error(e, "create")
     if not response.data:
         raise HTTPException(status_code=500, detail="Failed to create department.")
+    departments_cache.invalidate()
     return response.data[0]
 
 @departments_router.put("/{department_id}", response_model=DepartmentResponse, dependencies=[Security(get_api_key)])
 def update_department(department_id: int, department_update: DepartmentUpdate):
     """Update a department. Requires API key for admin access."""
-    # Check if department exists
-    existing_dept = supabase.table("departments").select("*").eq("id", department_id).single().execute()
-    if not existing_dept.data:
-        raise HTTPException(status_code=404, detail=f"Department with ID {department_id} not found.")
-    
     # Only update provided fields
-    update_data = {}
-    if department_update.name is not None:
-        # Check if new name conflicts with existing departments (excluding current one)
-        name_conflict = supabase.table("departments").select("id").eq("name", department_update.name).neq("id", department_id).execute()
-        if name_conflict.data:
-            raise HTTPException(status_code=400, detail="Department with this name already exists.")
-        update_data["name"] = department_update.name
-    
-    if department_update.email is not None:
-        # Check if new email conflicts with existing departments (excluding current one)
-        email_conflict = supabase.table("departments").select("id").eq("email", department_update.email).neq("id", department_id).execute()
-        if email_conflict.data:
-            raise HTTPException(status_code=400, detail="Department with this email already exists.")
-        update_data["email"] = department_update.email
-    
+    update_data = department_update.model_dump(exclude_none=True)
     if not update_data:
         # No changes provided, return current department
-        return existing_dept.data
+        cached = departments_cache.get(department_id)
+        if cached is None:
+            raise HTTPException(status_code=404, detail=f"Department with ID {department_id} not found.")
+        return cached[0]
     
-    response = supabase.table("departments").update(update_data).eq("id", department_id).execute()
+    # One conditional write: no matching row means the department doesn't exist,
+    # and name/email conflicts come back as unique violations.
+    try:
+        response = supabase.table("departments").update(update_data).eq("id", department_id).execute()
+    except APIError as e:
+        raise department_write_error(e, "update")
     if not response.data:
-        raise HTTPException(status_code=500, detail="Failed to update department.")
+        raise HTTPException(status_code=404, detail=f"Department with ID {department_id} not found.")
+    departments_cache.invalidate()
     return response.data[0]
 
 @departments_router.delete("/{department_id}", dependencies=[Security(get_api_key)])
 def delete_department(department_id: int):
     """Delete a department. Requires API key for admin access."""
-    # Check if department exists
-    existing_dept = supabase.table("departments").select("id").eq("id", department_id).single().execute()
-    if not existing_dept.data:
-        raise HTTPException(status_code=404, detail=f"Department with ID {department_id} not found.")
+    # Existence check, active-report check and delete run atomically in the database (migration 005)
+    try:
+        result = supabase.rpc("delete_department_if_idle", {"p_department_id": department_id}).execute().data
+    except APIError as e:
+        raise department_write_error(e, "delete")
     
-    # Check if department has active reports
-    active_reports = supabase.table("reports").select("id").eq("department_id", department_id).neq("status", "resolved").execute()
-    if active_reports.data:
+    if not result["exists"]:
+        raise HTTPException(status_code=404, detail=f"Department with ID {department_id} not found.")
+    if not result["deleted"]:
         raise HTTPException(
             status_code=400, 
-            detail=f"Cannot delete department. It has {len(active_reports.data)} active reports. Please resolve or reassign them first."
+            detail=f"Cannot delete department. It has {result['active_reports']} active reports. Please resolve or reassign them first."
         )
     
-    response = supabase.table("departments").delete().eq("id", department_id).execute()
-    if not response.data:
-        raise HTTPException(status_code=500, detail="Failed to delete department.")
+    departments_cache.invalidate()
+    # Rules pointing at the deleted department must not route new reports to it. The delete
+    # is already committed, so a failed reload only leaves the table to the scheduled refresh.
+    try:
+        routing_table.refresh()
+    except Exception as e:
+        print(f"ERROR: Could not reload the routing table after deleting department {department_id}: {e}")
     
     return {"message": f"Department with ID {department_id} has been deleted successfully."}
 
@@ -533,25 +1001,35 @@ def get_dashboard_data():
             )
         )
     
-    # Get all reports for KPIs
-    all_reports_res = supabase.table("reports").select("status").execute()
-    total_reports = len(all_reports_res.data)
-    resolved_reports = len([r for r in all_reports_res.data if r["status"] == "resolved"])
+    # KPIs come from the analytics rollup instead of a full-table scan
+    report_rollup.ensure_built(load_rollup)
+    counts = report_rollup.snapshot()
+    total_reports = counts["total_reports"]
+    resolved_reports = counts["reports_by_status"].get("resolved", 0)
     
-    # Mocked Department Performance (you can replace with real data)
+    # Department performance and resolution times are kept incrementally by the rollup;
+    # names come from the cached departments table.
+    department_names = {d['id']: d['name'] for d in departments_cache.get_all()[0]}
     department_performance_data = [
-        DepartmentPerformance(name="Public Works", resolved=156, total=200, rate=78),
-        DepartmentPerformance(name="Transportation", resolved=89, total=110, rate=81),
-        DepartmentPerformance(name="Parks & Recreation", resolved=67, total=75, rate=89),
-        DepartmentPerformance(name="Public Safety", resolved=134, total=145, rate=92),
+        DepartmentPerformance(
+            name=department_names.get(p["department_id"], f"Department {p['department_id']}"),
+            resolved=p["resolved"],
+            total=p["total"],
+            rate=p["rate"],
+            avgResolutionTime=format_duration(p["mean_resolution_seconds"]),
+            medianResolutionTime=format_duration(p["median_resolution_seconds"])
+        )
+        for p in report_rollup.department_performance()
     ]
+    mean_resolution, median_resolution = report_rollup.resolution_time()
     
     return DashboardData(
         kpis=KpiData(
             totalReports=total_reports,
             reportsResolved=resolved_reports,
-            avgResolutionTime="3.2 days", # Mocked
-            activeDepartments=4 # Mocked
+            avgResolutionTime=format_duration(mean_resolution),
+            medianResolutionTime=format_duration(median_resolution),
+            activeDepartments=len(department_performance_data)
         ),
         recentReports=recent_reports_data,
         departmentPerformance=department_performance_data
@@ -559,10 +1037,40 @@ def get_dashboard_data():
 
 
 # --- 5. Main FastAPI Application ---
+async def build_rollup():
+    """Builds the analytics rollup up front, so no request pays for the full scan."""
+    try:
+        await run_db(report_rollup.ensure_built, load_rollup)
+    except Exception as e:
+        print(f"ERROR: Could not build the analytics rollup at startup: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_ai_client()
+    try:
+        await refresh_routing_table()
+    except Exception as e:
+        print(f"ERROR: Could not load the routing table at startup: {e}")
+    classification_queue.start()
+    background_tasks = [
+        asyncio.create_task(build_rollup()),
+        asyncio.create_task(run_periodically(ROUTING_REFRESH_SECONDS, refresh_routing_table)),
+        asyncio.create_task(recover_pending_classifications()),
+        asyncio.create_task(run_periodically(CLASSIFICATION_SWEEP_INTERVAL_SECONDS, recover_pending_classifications)),
+    ]
+    yield
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await classification_queue.stop()
+    await close_ai_client()
+    db_executor.shutdown(wait=False)
+
 app = FastAPI(
     title="Civic Issue Reporting API (with User Auth)",
     description="Full backend with user registration, login, and protected routes.",
-    version="3.0.0"
+    version="3.0.0",
+    lifespan=lifespan
 )
 
 # Get allowed origins from environment or use defaults for development
@@ -577,6 +1085,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],  # Explicit methods only
     allow_headers=["Content-Type", "Authorization", "X-API-Key"],  # Explicit headers only
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],  # Let the portals read pagination cursors and ETags
 )
 
 # Add the new auth router
@@ -588,4 +1097,20 @@ app.include_router(departments_router)
 
 @app.get("/")
 def read_root():
-    return {"status": "API is running with JWT authentication. Visit /docs to test."}
\ No newline at end of file
+    return {"status": "API is running with JWT authentication. Visit /docs to test."}
+
+@app.get("/api/ai/metrics", tags=["AI"], dependencies=[Security(get_api_key)])
+def get_ai_service_metrics():
+    """AI client latency/error counters, circuit breaker state and classification queue stats."""
+    return {"client": get_ai_metrics(), "queue": classification_queue.stats()}
+
+@app.get("/api/routing", tags=["Routing"], dependencies=[Security(get_api_key)])
+def get_routing_table():
+    """The in-memory category -> department rules and how often the default was used."""
+    return routing_table.stats()
+
+@app.post("/api/routing/refresh", tags=["Routing"], dependencies=[Security(get_api_key)])
+async def refresh_routing():
+    """Reloads the routing rules now, e.g. right after editing category_department_mapping."""
+    rules = await refresh_routing_table()
+    return {"message": "Routing table reloaded.", "rules": rules}
\ No newline at end of file
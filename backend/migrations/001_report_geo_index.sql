@@ -0,0 +1,16 @@
+-- Geo index for location-filtered report queries (/api/reports/all).
+-- Run once in the Supabase SQL editor.
+
+-- Grid cell kept per report: 0.02 degree cells, row (from the south pole) * 18000
+-- + column (from -180). Must match geo_cell() in geo_service.py. Generated, so
+-- existing rows are filled in and inserts need not set it.
+alter table reports add column if not exists geo_cell bigint generated always as (
+    least(floor((latitude + 90) / 0.02)::bigint, 8999) * 18000
+    + least(floor((longitude + 180) / 0.02)::bigint, 17999)
+) stored;
+
+-- Serves the radius prefilter: an index lookup per grid cell around the center.
+create index if not exists reports_geo_cell_idx on reports (geo_cell);
+
+-- Serves the bounding-box prefilter for radii too large for a cell list.
+create index if not exists reports_lat_lon_idx on reports (latitude, longitude);
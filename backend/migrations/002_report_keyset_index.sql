@@ -0,0 +1,4 @@
+-- Keyset pagination index for report listings ordered by (created_at, id) desc.
+
+create index if not exists reports_created_at_id_idx on reports (created_at desc, id desc);
+create index if not exists reports_user_created_at_id_idx on reports (user_id, created_at desc, id desc);
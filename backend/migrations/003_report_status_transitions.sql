@@ -0,0 +1,15 @@
+-- Status-transition log written by PUT /api/reports/{id}/status.
+-- Used to rebuild resolution-time KPIs for the dashboard.
+
+create table if not exists report_status_transitions (
+    id bigserial primary key,
+    report_id bigint not null references reports (id) on delete cascade,
+    from_status text,
+    to_status text not null,
+    changed_at timestamptz not null default now()
+);
+
+create index if not exists report_status_transitions_to_status_idx
+    on report_status_transitions (to_status, id);
+create index if not exists report_status_transitions_report_idx
+    on report_status_transitions (report_id, changed_at);
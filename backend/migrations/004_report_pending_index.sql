@@ -0,0 +1,5 @@
+-- Lets the classification recovery sweep find pending reports without a table scan.
+
+create index if not exists reports_pending_classification_idx
+    on reports (created_at desc, id desc)
+    where category = 'Classification Pending';
@@ -0,0 +1,34 @@
+-- Lets department writes in main.py rely on the database instead of read-then-write checks.
+-- Resolve any existing duplicate names/emails before applying.
+
+-- Uniqueness enforced by the database; violations (23505) map to 400 responses.
+-- Also the conflict targets for POST /api/departments/bulk (upsert on name).
+create unique index if not exists departments_name_key on departments (name);
+create unique index if not exists departments_email_key on departments (email);
+
+-- DELETE /api/departments/{id} in one round trip: deletes the department only if it
+-- exists and has no unresolved reports, atomically.
+create or replace function delete_department_if_idle(p_department_id bigint)
+returns json
+language plpgsql
+as $$
+declare
+    v_active bigint;
+begin
+    -- Row lock: new reports referencing the department wait until we are done
+    perform 1 from departments where id = p_department_id for update;
+    if not found then
+        return json_build_object('exists', false, 'active_reports', 0, 'deleted', false);
+    end if;
+
+    select count(*) into v_active
+    from reports
+    where department_id = p_department_id and status <> 'resolved';
+    if v_active > 0 then
+        return json_build_object('exists', true, 'active_reports', v_active, 'deleted', false);
+    end if;
+
+    delete from departments where id = p_department_id;
+    return json_build_object('exists', true, 'active_reports', 0, 'deleted', true);
+end;
+$$;
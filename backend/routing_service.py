@@ -0,0 +1,67 @@
+"""
+Routing Service Module
+
+Keeps the category_department_mapping table in memory, so routing a classified
+report to its department is a dictionary lookup rather than a database round
+trip. The table rarely changes: it is loaded at startup, reloaded on a
+schedule, and can be reloaded on demand after an edit. Categories without a
+rule go to the default department, if one is configured.
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+
+class RoutingTable:
+    """
+    category name -> department id, loaded with `load()`, which returns the
+    mapping rows ({"category_name": ..., "department_id": ...}).
+    """
+
+    def __init__(self, load: Callable[[], Iterable[dict]], default_department_id: Optional[int] = None):
+        self.load = load
+        self.default_department_id = default_department_id
+        self._rules: Dict[str, Optional[int]] = {}
+        self._lock = threading.Lock()
+        self.loaded_at: Optional[float] = None
+        self.refreshes = 0
+        self.defaulted = 0
+        self._unrouted: set = set()
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def refresh(self) -> int:
+        """Reloads every rule, swapping the new table in at once. Returns the number of rules."""
+        rules = {row["category_name"]: row["department_id"] for row in self.load()}
+        with self._lock:
+            self._rules = rules
+            self._unrouted.clear()
+            self.loaded_at = time.time()
+            self.refreshes += 1
+        return len(rules)
+
+    def department_for(self, category: str) -> Optional[int]:
+        """The department for `category`, else the default department (None if there is none)."""
+        department_id = self._rules.get(category)
+        if department_id is not None:
+            return department_id
+        with self._lock:
+            self.defaulted += 1
+            if category not in self._unrouted:
+                # Warn once per category and table version, not once per report
+                self._unrouted.add(category)
+                print(f"WARNING: No routing rule for category '{category}'; using default department {self.default_department_id}.")
+        return self.default_department_id
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rules": dict(self._rules),
+                "default_department_id": self.default_department_id,
+                "loaded_at": self.loaded_at,
+                "refreshes": self.refreshes,
+                "defaulted": self.defaulted,
+                "unrouted_categories": sorted(self._unrouted),
+            }
@@ -0,0 +1,14 @@
+"""
+Lets the tests import the backend modules without a real deployment: main.py
+refuses to start without its environment, and the Supabase client it builds
+never connects until a query runs.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("API_SECRET_KEY", "test-secret-key-of-at-least-32-characters")
+os.environ.setdefault("AI_API_URL", "http://localhost:8001/api/classify")
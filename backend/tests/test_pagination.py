@@ -0,0 +1,37 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client():
+    # The app's lifespan (rollup rebuild, AI client, workers) isn't started:
+    # these requests are rejected before they reach the database.
+    main.app.dependency_overrides[main.get_current_user] = lambda: {"id": 1}
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def test_user_reports_reject_skip_without_limit(client):
+    response = client.get("/api/reports/", params={"skip": 20})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "skip requires limit."
+
+
+def test_user_reports_reject_skip_with_cursor(client):
+    cursor = main.encode_cursor({"created_at": "2024-01-01T00:00:00+00:00", "id": 5})
+    response = client.get("/api/reports/", params={"skip": 20, "limit": 10, "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_admin_reports_reject_skip_with_cursor(client):
+    cursor = main.encode_cursor({"created_at": "2024-01-01T00:00:00+00:00", "id": 5})
+    response = client.get("/api/reports/all", params={"skip": 20, "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_page_start_decodes_cursor():
+    cursor = main.encode_cursor({"created_at": "2024-01-01T00:00:00+00:00", "id": 5})
+    assert main.page_start(cursor, 0, 10) == ("2024-01-01T00:00:00+00:00", 5)
+    assert main.page_start(None, 20, 10) is None
@@ -0,0 +1,29 @@
+import filecmp
+import os
+
+import pytest
+
+from text_classifier import GENERAL_CATEGORY, TextClassifier
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AI_SERVER_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "ai_model_server")
+
+
+@pytest.mark.parametrize("filename", ["text_classifier.py", "text_keywords.json"])
+def test_copies_match_the_ai_model_server(filename):
+    # Each service ships its own copy; both must classify descriptions the same way
+    other = os.path.join(AI_SERVER_DIR, filename)
+    if not os.path.exists(other):
+        pytest.skip("ai_model_server is not checked out next to the backend")
+    assert filecmp.cmp(os.path.join(BACKEND_DIR, filename), other, shallow=False)
+
+
+def test_matches_whole_words_only():
+    classifier = TextClassifier()
+    assert classifier.classify("The cabinet door is stuck")[0] == GENERAL_CATEGORY
+    assert classifier.classify("Overflowing bins near the market")[0] == "Waste Management"
+
+
+def test_phrase_outweighs_its_words():
+    category, _ = TextClassifier().classify("The street light has been dark for a week")
+    assert category == "Streetlight Outage"